@@ -0,0 +1,188 @@
+import asyncio
+import os
+import random
+import time
+
+import metrics
+import tokens
+from llm_cache import get_cache
+from marking import LLM_MODEL, LLM_TEMPERATURE, TOO_LONG_NOTE, build_messages, feedback_key, heuristic_feedback
+
+# ----------------------------
+# Async grading engine
+#  - Many llm_feedback-style prompts in flight at once, bounded by a semaphore
+#  - Token buckets keep requests/min and tokens/min under the provider quota
+#  - 429 / 5xx / connection errors retry with jittered exponential backoff,
+#    then fall back to heuristic_feedback for that item only
+# ----------------------------
+def estimate_tokens(text: str):
+    return max(1, tokens.count_tokens(text))
+
+class TokenBucket:
+    def __init__(self, per_minute: float, capacity: float = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0):
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.level >= amount:
+                    self.level -= amount
+                    return
+                await asyncio.sleep((amount - self.level) / self.rate)
+
+    def adjust(self, amount: float):
+        # settle the difference between the estimate and actual usage (may go negative)
+        self._refill()
+        self.level -= amount
+
+def _retryable(exc: Exception):
+    import openai
+    if isinstance(exc, (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    return isinstance(exc, openai.APIStatusError) and exc.status_code >= 500
+
+def _retry_after(exc: Exception):
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+class AsyncGrader:
+    def __init__(self, concurrency: int = 16, requests_per_minute: float = 500, tokens_per_minute: float = 200_000,
+                 max_attempts: int = 5, base_delay: float = 0.5, max_delay: float = 30.0, output_token_estimate: int = 800,
+                 client=None, use_cache: bool = True):
+        self.concurrency = concurrency
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # reserved from the token budget per call until the real usage is known; the request itself
+        # carries no max_tokens, so bulk feedback matches llm_feedback's
+        self.output_token_estimate = output_token_estimate
+        self.client = client
+        self._owns_client = client is None
+        self.use_cache = use_cache
+        self.stats = {"llm": 0, "cache": 0, "heuristic": 0, "retries": 0}
+        self._inflight = {}  # cache key -> task of the call in flight for it
+        self._sem = None
+
+    def _client(self):
+        if self.client is None:
+            from openai import AsyncOpenAI
+            # retries are handled here so they share the rate limiter
+            self.client = AsyncOpenAI(max_retries=0, timeout=float(os.getenv("CHEM_BOT_LLM_TIMEOUT", "30")))
+        return self.client
+
+    def _semaphore(self):
+        # grade() called without a shared semaphore is still bounded by the grader's concurrency
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.concurrency)
+        return self._sem
+
+    async def grade(self, answer: str, q: dict, sem: asyncio.Semaphore = None):
+        t0 = time.perf_counter()
+        messages, build_text = build_messages(answer, q)
+        result = {"source": "llm", "attempts": 0}
+        key = feedback_key(answer, q)
+        cache = get_cache() if self.use_cache else None
+        cached = cache.get(key) if cache else None
+        if cached is not None:
+            result.update(source="cache", feedback=cached)
+        elif not os.getenv("OPENAI_API_KEY", "").strip() and self.client is None:
+            result.update(source="heuristic", feedback=heuristic_feedback(answer, q, build_text))
+        elif tokens.over_limit(answer):
+            result.update(source="heuristic", error="answer too long",
+                          feedback=TOO_LONG_NOTE + heuristic_feedback(answer, q, build_text))
+        else:
+            # identical answers share one call: later ones wait for the first instead of queueing
+            # their own (and shield it, so one waiter being cancelled doesn't cancel the rest)
+            flight = self._inflight.get(key)
+            if flight is None:
+                flight = self._inflight[key] = asyncio.ensure_future(self._call(key, messages, cache, sem))
+                flight.add_done_callback(lambda _: self._inflight.pop(key, None))
+                fb, attempts, error, source = await asyncio.shield(flight)
+            else:
+                fb, attempts, error, _ = await asyncio.shield(flight)
+                attempts, source = 0, "cache"
+                result["coalesced"] = True
+            result.update(source=source, attempts=attempts)
+            if fb is not None:
+                result["feedback"] = fb
+            else:
+                result.update(source="heuristic", error=error,
+                              feedback=f"⚠️ LLM error: {error}\n\n" + heuristic_feedback(answer, q, build_text))
+        self.stats[result["source"]] += 1
+        result["latency_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        return result
+
+    async def _call(self, key: str, messages: list, cache, sem: asyncio.Semaphore = None):
+        # -> (feedback or None, attempts, error, source); the cache is checked again once a slot is
+        # free, since an identical answer may have been marked while this one queued
+        async with sem or self._semaphore():
+            cached = cache.get(key) if cache else None
+            if cached is not None:
+                return cached, 0, None, "cache"
+            fb, attempts, error = await self._complete(messages)
+        if fb is not None and cache:
+            cache.put(key, fb)
+        return fb, attempts, error, "llm"
+
+    async def _complete(self, messages: list):
+        estimate = sum(estimate_tokens(m["content"]) for m in messages) + self.output_token_estimate
+        error = None
+        for attempt in range(1, self.max_attempts + 1):
+            await self.requests.acquire(1)
+            await self.tokens.acquire(estimate)
+            try:
+                completion = await self._client().chat.completions.create(
+                    model=LLM_MODEL,
+                    messages=messages,
+                    temperature=LLM_TEMPERATURE,
+                )
+                usage = getattr(completion, "usage", None)
+                metrics.record_usage(usage)
+                if usage is not None:
+                    self.tokens.adjust(usage.total_tokens - estimate)
+                return completion.choices[0].message.content, attempt, None
+            except Exception as e:
+                error = str(e)
+                if not _retryable(e) or attempt == self.max_attempts:
+                    return None, attempt, error
+                self.stats["retries"] += 1
+                delay = _retry_after(e) or random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+                await asyncio.sleep(delay)
+        return None, self.max_attempts, error
+
+    async def aclose(self):
+        # the async client is bound to the running event loop, so close it before the loop ends;
+        # a client passed in by the caller is theirs to close
+        if self.client is not None and self._owns_client:
+            await self.client.close()
+            self.client = None
+
+    async def grade_many(self, items):
+        # items: iterable of (answer, question) pairs; results come back in input order
+        sem = asyncio.Semaphore(self.concurrency)
+        return await asyncio.gather(*(self.grade(answer, q, sem) for answer, q in items))
+
+def grade_all(items, **kwargs):
+    async def run():
+        grader = AsyncGrader(**kwargs)
+        try:
+            return await grader.grade_many(list(items))
+        finally:
+            await grader.aclose()
+    return asyncio.run(run())
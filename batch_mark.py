@@ -0,0 +1,218 @@
+"""
+Offline batch marking.
+
+    python batch_mark.py answers.csv -o results.jsonl [--llm] [--workers 8]
+    python batch_mark.py answers.csv -o results.jsonl --scorer tfidf   # local similarity scorer
+
+Input rows (CSV with a header, or JSONL) need question_id, student_id and answer.
+Results are appended to the output JSONL in input order, so an interrupted run
+resumes from the last complete line when started again with the same arguments.
+"""
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import csv
+import json
+import os
+import sys
+import time
+
+from async_grader import AsyncGrader
+import numeric
+import similarity
+from marking import heuristic_feedback, render_feedback, rubric_for
+from question_store import get_store
+
+# ----------------------------
+# Input / checkpoint
+# ----------------------------
+def iter_rows(path: str, fmt: str = ""):
+    fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+def resume_offset(out_path: str):
+    # number of rows already written; a torn final line (crash mid-write) is cut off
+    if not os.path.exists(out_path):
+        return 0
+    done, good = 0, 0
+    with open(out_path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                json.loads(line)
+            except ValueError:
+                break
+            done += 1
+            good += len(line)
+    if good != os.path.getsize(out_path):
+        with open(out_path, "r+b") as f:
+            f.truncate(good)
+    return done
+
+def chunked(rows, size: int, start: int):
+    chunk = []
+    for i, row in enumerate(rows):
+        if i < start:
+            continue
+        chunk.append((i, row))
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+# ----------------------------
+# Worker
+# ----------------------------
+def lookup(row: dict):
+    return get_store().get((row.get("question_id") or "").strip())
+
+def record(i: int, row: dict):
+    rec = {"row": i, "question_id": row.get("question_id"), "student_id": row.get("student_id")}
+    if lookup(row) is None:
+        rec["error"] = f"unknown question_id {row.get('question_id')!r}"
+    return rec
+
+def mark_chunk(chunk, scorer: str = "heuristic"):
+    t0 = time.perf_counter()
+    store = get_store()
+    results = []
+    by_question = collections.defaultdict(list)  # question id -> [(rec, answer)]
+    for i, row in chunk:
+        rec = record(i, row)
+        if "error" not in rec:
+            by_question[lookup(row)["id"]].append((rec, row.get("answer") or ""))
+        results.append(rec)
+
+    # answers are marked per question so the local scorer and numeric checks run vectorised
+    for qid, items in by_question.items():
+        q = store.get(qid)
+        answers = [answer for _, answer in items]
+        if scorer == "tfidf":
+            confidence, _ = store.similarity.score_batch(answers, q)
+            for (rec, answer), conf in zip(items, confidence):
+                rec["feedback"] = render_feedback(answer, q, *similarity.split(q, conf))
+                rec["confidence"] = [round(float(c), 3) for c in conf]
+        else:
+            for rec, answer in items:
+                rec["feedback"] = heuristic_feedback(answer, q, "")
+
+        compiled = rubric_for(q)["numeric"]
+        if compiled:
+            hits = numeric.check_batch(answers, compiled)
+            formula = numeric.check_formula(answers, compiled)
+            for (rec, _), row_hits, formula_hit in zip(items, hits, formula):
+                rec["numeric"] = {t["label"]: bool(hit) for t, hit in zip(compiled["targets"], row_hits)}
+                if compiled["formula"]:
+                    rec["numeric"]["formula"] = bool(formula_hit)
+    return os.getpid(), time.perf_counter() - t0, results
+
+# LLM marking is I/O-bound, so it runs on the async engine in this process instead of the pool
+async def grade_chunk(chunk, grader: AsyncGrader, sem: asyncio.Semaphore):
+    async def one(i, row):
+        rec = record(i, row)
+        if "error" not in rec:
+            res = await grader.grade(row.get("answer") or "", lookup(row), sem)
+            rec.update(feedback=res["feedback"], source=res["source"])
+            if "error" in res:
+                rec["llm_error"] = res["error"]
+        return rec
+    return await asyncio.gather(*(one(i, row) for i, row in chunk))
+
+async def run_llm(chunks, out, per_worker, grader: AsyncGrader, window_size: int = 4):
+    t0 = time.perf_counter()
+    sem = asyncio.Semaphore(grader.concurrency)
+    window = collections.deque()
+    try:
+        for chunk in chunks:
+            window.append(asyncio.ensure_future(grade_chunk(chunk, grader, sem)))
+            if len(window) >= window_size:
+                _write(await window.popleft(), out, per_worker, "async")
+        while window:
+            _write(await window.popleft(), out, per_worker, "async")
+    finally:
+        await grader.aclose()
+    per_worker["async"][1] = time.perf_counter() - t0
+
+# ----------------------------
+# Driver
+# ----------------------------
+def run(in_path: str, out_path: str, workers: int = 0, chunk_size: int = 64, use_llm: bool = False, fmt: str = "",
+        grader: AsyncGrader = None, scorer: str = "heuristic", log=sys.stderr):
+    workers = workers or os.cpu_count() or 1
+    start = resume_offset(out_path)
+    if start:
+        print(f"Resuming after {start} completed rows.", file=log)
+
+    per_worker = collections.defaultdict(lambda: [0, 0.0])  # pid -> [answers, busy seconds]
+    t0 = time.perf_counter()
+    with open(out_path, "a", encoding="utf-8") as out:
+        chunks = chunked(iter_rows(in_path, fmt), chunk_size, start)
+        if use_llm:
+            asyncio.run(run_llm(chunks, out, per_worker, grader or AsyncGrader()))
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+                # bounded window of in-flight chunks keeps memory flat; results are written in input order
+                window = collections.deque()
+                for chunk in chunks:
+                    window.append(pool.submit(mark_chunk, chunk, scorer))
+                    if len(window) >= workers * 2:
+                        _drain(window.popleft(), out, per_worker)
+                while window:
+                    _drain(window.popleft(), out, per_worker)
+    wall = time.perf_counter() - t0
+    written = sum(n for n, _ in per_worker.values())
+
+    summary = {
+        "rows": written,
+        "skipped": start,
+        "seconds": round(wall, 3),
+        "answers_per_sec": round(written / wall, 1) if wall else 0.0,
+        "workers": {str(pid): {"answers": n, "answers_per_sec": round(n / busy, 1) if busy else 0.0}
+                    for pid, (n, busy) in sorted(per_worker.items())},
+    }
+    print(f"Marked {written} answers in {wall:.2f}s ({summary['answers_per_sec']}/s, {len(per_worker)} workers)", file=log)
+    for pid, stats in summary["workers"].items():
+        print(f"  worker {pid}: {stats['answers']} answers, {stats['answers_per_sec']}/s", file=log)
+    return summary
+
+def _drain(future, out, per_worker):
+    pid, busy, results = future.result()
+    _write(results, out, per_worker, pid)
+    per_worker[pid][1] += busy
+
+def _write(results, out, per_worker, worker):
+    for rec in results:
+        out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    out.flush()
+    per_worker[worker][0] += len(results)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Mark a CSV/JSONL of student answers offline.")
+    ap.add_argument("input", help="CSV (with header) or JSONL of question_id, student_id, answer")
+    ap.add_argument("-o", "--output", required=True, help="results JSONL (appended to; used as the resume checkpoint)")
+    ap.add_argument("--format", choices=["csv", "jsonl"], default="", help="input format (default: from file extension)")
+    ap.add_argument("--workers", type=int, default=0, help="worker processes (default: CPU count)")
+    ap.add_argument("--chunk-size", type=int, default=64, help="rows per task sent to a worker")
+    ap.add_argument("--llm", action="store_true", help="mark with the LLM via the async engine (heuristics without OPENAI_API_KEY)")
+    ap.add_argument("--concurrency", type=int, default=16, help="--llm: requests in flight")
+    ap.add_argument("--rpm", type=float, default=500, help="--llm: requests per minute limit")
+    ap.add_argument("--tpm", type=float, default=200_000, help="--llm: tokens per minute limit")
+    ap.add_argument("--scorer", choices=["heuristic", "tfidf"], default="heuristic", help="local marker when not using --llm")
+    ap.add_argument("--bank", default="", help="question bank JSON/SQLite (default: CHEM_BOT_BANK or the built-in bank)")
+    args = ap.parse_args(argv)
+    if args.bank:
+        os.environ["CHEM_BOT_BANK"] = args.bank  # inherited by worker processes
+    grader = AsyncGrader(concurrency=args.concurrency, requests_per_minute=args.rpm, tokens_per_minute=args.tpm) if args.llm else None
+    run(args.input, args.output, args.workers, args.chunk_size, args.llm, args.format, grader, args.scorer)
+
+if __name__ == "__main__":
+    main()
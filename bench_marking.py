@@ -0,0 +1,150 @@
+"""
+Benchmarks for the marking hot paths, run over every question in the bank.
+
+    python bench_marking.py                                   # print results
+    python bench_marking.py --save-baseline bench_baseline.json
+    python bench_marking.py --baseline bench_baseline.json --threshold 0.25   # exit 1 on regression
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+import types
+
+import llm_cache
+import llm_client
+from marking import approx_equal, build_messages, compile_rubric, heuristic_feedback, llm_feedback
+from question_store import get_store
+
+ANSWER_LENGTHS = (10, 50, 200, 500, 2000)
+FILLER = ("the", "reaction", "because", "so", "increases", "therefore", "solution", "moles", "shift",
+          "equilibrium", "acid", "base", "value", "concentration", "temperature", "result", "and", "this")
+
+# ----------------------------
+# Synthetic corpus
+# ----------------------------
+def synthetic_answer(q: dict, words: int, rng: random.Random):
+    # mix of the question's own criterion vocabulary, filler, and the odd number
+    vocab = [w.lower() for c in q["criteria"] for w in re.findall(r"[A-Za-z]+", c)] or list(FILLER)
+    out = []
+    for _ in range(words):
+        r = rng.random()
+        if r < 0.3:
+            out.append(rng.choice(vocab))
+        elif r < 0.95:
+            out.append(rng.choice(FILLER))
+        else:
+            out.append(f"{rng.uniform(0, 5):.3f}")
+    return " ".join(out)
+
+def build_corpus(questions, lengths=ANSWER_LENGTHS, per_question: int = 3, seed: int = 1234):
+    rng = random.Random(seed)
+    return {n: [(synthetic_answer(q, n, rng), q) for q in questions for _ in range(per_question)] for n in lengths}
+
+# ----------------------------
+# Fake LLM client (no network, fixed latency)
+# ----------------------------
+class FakeLLMClient:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        message = types.SimpleNamespace(content="### ✅ Strengths\n• ok")
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=None)
+
+# ----------------------------
+# Runner
+# ----------------------------
+def measure(fn, items, rounds: int):
+    samples = []
+    t_start = time.perf_counter()
+    for _ in range(rounds):
+        for item in items:
+            t0 = time.perf_counter_ns()
+            fn(item)
+            samples.append(time.perf_counter_ns() - t0)
+    wall = time.perf_counter() - t_start
+    samples.sort()
+
+    def pct(p):
+        return samples[min(len(samples) - 1, int(p * len(samples)))] / 1000.0
+
+    return {"calls": len(samples), "ops_per_sec": round(len(samples) / wall, 1) if wall else 0.0,
+            "p50_us": pct(0.5), "p95_us": pct(0.95), "p99_us": pct(0.99)}
+
+def run_benchmarks(rounds: int = 5, llm_latency: float = 0.0, lengths=ANSWER_LENGTHS, seed: int = 1234):
+    questions = get_store().questions
+    corpus = build_corpus(questions, lengths, seed=seed)
+    results = {}
+
+    for n in lengths:
+        results[f"heuristic_feedback[{n}w]"] = measure(lambda item: heuristic_feedback(item[0], item[1], ""), corpus[n], rounds)
+    store = get_store()
+    for n in lengths:
+        results[f"similarity_score[{n}w]"] = measure(lambda item: store.similarity.score(item[0], item[1]), corpus[n], rounds)
+    # the rule resolution itself: build_it_up_steps is lru-cached, so timing it would time a cache hit
+    results["compile_rubric"] = measure(compile_rubric, questions, rounds * 50)
+    results["approx_equal"] = measure(lambda pair: approx_equal(*pair), [("0.12", 0.120), ("abc", 1.0), (2.87, 2.9)], rounds * 1000)
+    mid = corpus[lengths[len(lengths) // 2]]
+    results["build_messages"] = measure(lambda item: build_messages(item[0], item[1]), mid, rounds)
+
+    # llm_feedback end to end against the fake client, with the cache disabled so every call "hits the API"
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    llm_client.set_client(FakeLLMClient(llm_latency))
+    llm_cache.set_cache(llm_cache.FeedbackCache(path="", max_memory_items=0))
+    llm_rounds = 1 if llm_latency else rounds
+    results["llm_feedback"] = measure(lambda item: llm_feedback(item[0], item[1]), mid, llm_rounds)
+    return results
+
+def compare(results: dict, baseline: dict, threshold: float):
+    # a path regresses when its p50 grows by more than threshold (e.g. 0.25 = 25%)
+    regressions = []
+    for name, base in baseline.items():
+        cur = results.get(name)
+        if cur is None or not base.get("p50_us"):
+            continue
+        change = cur["p50_us"] / base["p50_us"] - 1
+        if change > threshold:
+            regressions.append((name, base["p50_us"], cur["p50_us"], change))
+    return regressions
+
+def print_table(results: dict, out=sys.stdout):
+    print(f"{'path':28} {'calls':>8} {'ops/s':>12} {'p50 µs':>10} {'p95 µs':>10} {'p99 µs':>10}", file=out)
+    for name, r in results.items():
+        print(f"{name:28} {r['calls']:>8} {r['ops_per_sec']:>12,.1f} {r['p50_us']:>10.1f} {r['p95_us']:>10.1f} {r['p99_us']:>10.1f}", file=out)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark the marking hot paths.")
+    ap.add_argument("--rounds", type=int, default=5, help="passes over the corpus per path")
+    ap.add_argument("--llm-latency", type=float, default=0.0, help="seconds the fake LLM client sleeps per call")
+    ap.add_argument("--seed", type=int, default=1234)
+    ap.add_argument("--json", default="", help="also write results to this JSON file")
+    ap.add_argument("--save-baseline", default="", help="write results as a baseline JSON")
+    ap.add_argument("--baseline", default="", help="compare against a saved baseline")
+    ap.add_argument("--threshold", type=float, default=0.25, help="allowed p50 slowdown vs baseline (fraction)")
+    args = ap.parse_args(argv)
+
+    results = run_benchmarks(args.rounds, args.llm_latency, seed=args.seed)
+    print_table(results)
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for name, before, after, change in regressions:
+            print(f"REGRESSION {name}: p50 {before:.1f} µs -> {after:.1f} µs (+{change:.0%})", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"No path regressed more than {args.threshold:.0%} against {args.baseline}.")
+
+if __name__ == "__main__":
+    main()
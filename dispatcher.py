@@ -0,0 +1,110 @@
+import collections
+import concurrent.futures
+import threading
+
+# ----------------------------
+# LLM dispatcher
+#  - A fixed set of worker threads runs every outbound LLM call in the process, so a burst of
+#    submissions queues instead of opening one blocked call per Streamlit session
+#  - Single-flight: a job submitted while an identical one (same key) is queued or running
+#    shares that job's future instead of making a second call
+#  - Fair queue: one FIFO per session, served round-robin, so a session with several jobs
+#    can't hold back everyone else; position() reports how many jobs will start first
+#  - A queued job whose callers have all given up is dropped before it is ever sent
+# ----------------------------
+class Job:
+    def __init__(self, key, session: str, fn, args, kwargs):
+        self.key = key
+        self.session = session
+        self.fn, self.args, self.kwargs = fn, args, kwargs
+        self.future = concurrent.futures.Future()
+        self.waiters = 1
+        self.started = False
+
+class Dispatcher:
+    def __init__(self, workers: int = 8, name: str = "llm"):
+        self.workers = workers
+        self.name = name
+        self.running = 0
+        self.stats = {"submitted": 0, "coalesced": 0, "completed": 0, "cancelled": 0}
+        self._queues = collections.OrderedDict()  # session -> deque of jobs, in round-robin order
+        self._inflight = {}  # key -> queued or running job
+        self._cond = threading.Condition()
+        self._threads = []
+
+    def submit(self, key, fn, *args, session: str = "", **kwargs):
+        # -> (job, created); created is False when the call was coalesced into an in-flight job
+        with self._cond:
+            job = self._inflight.get(key)
+            if job is not None:
+                job.waiters += 1
+                self.stats["coalesced"] += 1
+                return job, False
+            job = self._inflight[key] = Job(key, session, fn, args, kwargs)
+            self._queues.setdefault(session, collections.deque()).append(job)
+            self.stats["submitted"] += 1
+            if len(self._threads) < self.workers:
+                t = threading.Thread(target=self._work, name=f"{self.name}-{len(self._threads)}", daemon=True)
+                self._threads.append(t)
+                t.start()
+            self._cond.notify()
+            return job, True
+
+    def position(self, job: Job):
+        # jobs that will start before this one (0 once it is running or next in line)
+        with self._cond:
+            if job.started or job.session not in self._queues:
+                return 0
+            sessions = list(self._queues)
+            index = self._queues[job.session].index(job)
+            rank = sessions.index(job.session)
+            return sum(min(len(self._queues[s]), index + (r < rank)) for r, s in enumerate(sessions))
+
+    def abandon(self, job: Job):
+        # a caller stopped waiting; a queued job nobody is waiting for is dropped
+        with self._cond:
+            job.waiters -= 1
+            if job.waiters > 0 or job.started:
+                return
+            queue = self._queues.get(job.session)
+            if queue is not None and job in queue:
+                queue.remove(job)
+                if not queue:
+                    del self._queues[job.session]
+                if self._inflight.get(job.key) is job:
+                    del self._inflight[job.key]
+                job.future.cancel()
+                self.stats["cancelled"] += 1
+
+    def snapshot(self):
+        with self._cond:
+            return {"queued": sum(len(q) for q in self._queues.values()), "running": self.running,
+                    "sessions_waiting": len(self._queues), **self.stats}
+
+    def _next(self):
+        # called with the lock held: head of the first session's queue, then that session moves to the back
+        session, queue = next(iter(self._queues.items()))
+        job = queue.popleft()
+        del self._queues[session]
+        if queue:
+            self._queues[session] = queue
+        return job
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._queues:
+                    self._cond.wait()
+                job = self._next()
+                job.started = True
+                self.running += 1
+            try:
+                job.future.set_result(job.fn(*job.args, **job.kwargs))
+            except BaseException as e:
+                job.future.set_exception(e)
+            finally:
+                with self._cond:
+                    self.running -= 1
+                    self.stats["completed"] += 1
+                    if self._inflight.get(job.key) is job:
+                        del self._inflight[job.key]
@@ -0,0 +1,138 @@
+"""
+Local stand-in for the OpenAI chat completions API, for load tests and benchmarks.
+
+    python fake_llm.py --port 8001 --latency 0.5 --error-rate 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=test streamlit run chem_bot.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FAKE_FEEDBACK = """### ✅ Strengths
+• Relevant ideas are present.
+### ⚠️ Marks Lost (mapped to criteria)
+• Link each point back to the question.
+### 🧱 Build It Up
+1. Identify → describe → explain → conclude.
+### 🧠 Exemplar Response
+A complete response addresses every criterion.
+### 🔧 Next Steps (3 bullet points)
+• Plan first.
+• Show working.
+• Conclude clearly.
+### ☑️ Final Checklist
+• Did I answer every part of the question?"""
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with server.lock:
+            server.requests += 1
+            server.connections.add(self.client_address)
+        time.sleep(server.latency * random.uniform(0.5, 1.5) if server.jitter else server.latency)  # time to first byte
+        if not self.path.endswith("/chat/completions"):
+            return self._send_json(404, {"error": {"message": "not found"}})
+        if random.random() < server.error_rate:
+            status = random.choice([429, 500, 503])
+            return self._send_json(status, {"error": {"message": f"fake error {status}", "type": "server_error"}})
+
+        prompt_tokens = sum(len(m.get("content", "")) for m in req.get("messages", [])) // 4
+        content = server.content
+        if req.get("stream"):
+            return self._stream(req, content, prompt_tokens)
+        self._send_json(200, {
+            "id": f"chatcmpl-fake-{server.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": req.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                      "total_tokens": prompt_tokens + len(content) // 4},
+        })
+
+    def _stream(self, req: dict, content: str, prompt_tokens: int):
+        # server-sent events over chunked transfer encoding, one small text piece per event
+        server = self.server
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send(data: str):
+            raw = f"data: {data}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(raw):X}\r\n".encode("ascii") + raw + b"\r\n")
+            self.wfile.flush()
+
+        pieces = re.findall(r"\S*\s*", content)
+        breaks_at = len(pieces) // 2 if random.random() < server.break_rate else None
+        base = {"id": f"chatcmpl-fake-{server.requests}", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": req.get("model", "fake")}
+        for i, piece in enumerate(pieces):
+            if i == breaks_at:
+                self.close_connection = True
+                self.wfile.write(b"5\r\nbroke")  # torn chunk, then drop the connection
+                return
+            if not piece:
+                continue
+            send(json.dumps({**base, "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}))
+            if server.token_delay:
+                time.sleep(server.token_delay)
+        send(json.dumps({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}))
+        if (req.get("stream_options") or {}).get("include_usage"):
+            send(json.dumps({**base, "choices": [], "usage": {
+                "prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                "total_tokens": prompt_tokens + len(content) // 4}}))
+        send("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+def serve(host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, error_rate: float = 0.0, jitter: bool = False,
+          token_delay: float = 0.0, break_rate: float = 0.0, content: str = FAKE_FEEDBACK):
+    # starts in a daemon thread; base URL is f"http://{host}:{server.server_port}/v1"
+    server = ThreadingHTTPServer((host, port), FakeLLMHandler)
+    server.daemon_threads = True
+    server.latency, server.error_rate, server.jitter, server.content = latency, error_rate, jitter, content
+    server.token_delay, server.break_rate = token_delay, break_rate
+    server.requests, server.connections, server.lock = 0, set(), threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def base_url(server):
+    return f"http://{server.server_address[0]}:{server.server_port}/v1"
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Fake OpenAI-compatible chat completions server.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8001)
+    ap.add_argument("--latency", type=float, default=0.5, help="seconds per response")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 429/5xx")
+    ap.add_argument("--jitter", action="store_true", help="randomise latency ±50%%")
+    ap.add_argument("--token-delay", type=float, default=0.02, help="seconds between streamed pieces")
+    ap.add_argument("--break-rate", type=float, default=0.0, help="fraction of streams dropped midway")
+    args = ap.parse_args(argv)
+    server = serve(args.host, args.port, args.latency, args.error_rate, args.jitter, args.token_delay, args.break_rate)
+    print(f"Fake LLM listening on {base_url(server)}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
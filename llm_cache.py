@@ -0,0 +1,137 @@
+import collections
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import metrics
+
+# ----------------------------
+# Feedback cache
+#  - Keyed on question id + normalised answer hash + model + temperature + prompt hash; the
+#    prompt is everything sent besides the answer, so editing a question or the marker
+#    instructions retires its cached feedback instead of serving it for the new version
+#  - In-memory LRU in front of an on-disk SQLite table, with size/TTL eviction
+# ----------------------------
+def normalize_answer(answer: str):
+    return re.sub(r"\s+", " ", answer).strip().casefold()
+
+def cache_key(question_id: str, answer: str, model: str, temperature: float, prompt: str = ""):
+    answer_hash = hashlib.sha256(normalize_answer(answer).encode("utf-8")).hexdigest()
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    raw = json.dumps([question_id, answer_hash, model, round(float(temperature), 3), prompt_hash])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class FeedbackCache:
+    def __init__(self, path: str = "", max_memory_items: int = 1024, max_disk_items: int = 100_000, ttl_seconds: float = 30 * 24 * 3600):
+        self.path = path
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+        self.ttl_seconds = ttl_seconds
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self._lru = collections.OrderedDict()  # key -> (created_at, value)
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS feedback ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS feedback_accessed ON feedback(accessed_at)")
+            self._db.commit()
+
+    def _expired(self, created_at: float, now: float):
+        return self.ttl_seconds and now - created_at > self.ttl_seconds
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            item = self._lru.get(key)
+            if item is not None:
+                if not self._expired(item[0], now):
+                    self._lru.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return item[1]
+                del self._lru[key]
+
+            if self._db is not None:
+                row = self._db.execute("SELECT value, created_at FROM feedback WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    value, created_at = row
+                    if not self._expired(created_at, now):
+                        self._db.execute("UPDATE feedback SET accessed_at = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        self._remember(key, created_at, value)
+                        self.stats["disk_hits"] += 1
+                        return value
+                    self._db.execute("DELETE FROM feedback WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO feedback (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now),
+                )
+                self._evict_disk(now)
+                self._db.commit()
+
+    def _remember(self, key: str, created_at: float, value: str):
+        self._lru[key] = (created_at, value)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_memory_items:
+            self._lru.popitem(last=False)
+
+    def _evict_disk(self, now: float):
+        n = 0
+        if self.ttl_seconds:
+            n += self._db.execute("DELETE FROM feedback WHERE created_at < ?", (now - self.ttl_seconds,)).rowcount
+        (count,) = self._db.execute("SELECT COUNT(*) FROM feedback").fetchone()
+        if count > self.max_disk_items:
+            n += self._db.execute(
+                "DELETE FROM feedback WHERE key IN (SELECT key FROM feedback ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_disk_items,),
+            ).rowcount
+        self.stats["evictions"] += n
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((lookups - stats["misses"]) / lookups, 3) if lookups else 0.0
+        return stats
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+def get_cache():
+    # process-wide cache; CHEM_BOT_CACHE_PATH="" keeps it memory-only
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = FeedbackCache(
+                path=os.getenv("CHEM_BOT_CACHE_PATH", ".chem_bot_cache.sqlite"),
+                max_memory_items=int(os.getenv("CHEM_BOT_CACHE_MEMORY_ITEMS", "1024")),
+                max_disk_items=int(os.getenv("CHEM_BOT_CACHE_DISK_ITEMS", "100000")),
+                ttl_seconds=float(os.getenv("CHEM_BOT_CACHE_TTL", str(30 * 24 * 3600))),
+            )
+            cache = _default_cache
+            metrics.add_collector(lambda: {f"cache_{k}": v for k, v in cache.snapshot().items()})
+        return _default_cache
+
+def set_cache(cache: FeedbackCache):
+    # swap the process-wide cache (benchmarks and load tests use a memory-only or disabled one)
+    global _default_cache
+    with _default_lock:
+        _default_cache = cache
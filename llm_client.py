@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+
+import metrics
+from dispatcher import Dispatcher
+
+try:
+    import httpx
+except ImportError:  # newer openai releases are built on the httpx2 fork
+    import httpx2 as httpx
+
+# ----------------------------
+# Shared OpenAI client
+#  - One client per process, so every Streamlit session reuses pooled keep-alive connections
+#  - Tunable via env: CHEM_BOT_LLM_POOL_SIZE, CHEM_BOT_LLM_KEEPALIVE, CHEM_BOT_LLM_TIMEOUT,
+#    CHEM_BOT_LLM_CONNECT_TIMEOUT, CHEM_BOT_LLM_MAX_RETRIES (OPENAI_BASE_URL points it at a stub server)
+# ----------------------------
+def client_settings():
+    return {
+        "pool_size": int(os.getenv("CHEM_BOT_LLM_POOL_SIZE", "20")),
+        "keepalive": float(os.getenv("CHEM_BOT_LLM_KEEPALIVE", "60")),
+        "timeout": float(os.getenv("CHEM_BOT_LLM_TIMEOUT", "30")),
+        "connect_timeout": float(os.getenv("CHEM_BOT_LLM_CONNECT_TIMEOUT", "5")),
+        "max_retries": int(os.getenv("CHEM_BOT_LLM_MAX_RETRIES", "2")),
+    }
+
+def build_client(pool_size: int = 20, keepalive: float = 60.0, timeout: float = 30.0, connect_timeout: float = 5.0, max_retries: int = 2, base_url: str = ""):
+    from openai import OpenAI, DefaultHttpxClient
+    http_client = DefaultHttpxClient(
+        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size, keepalive_expiry=keepalive),
+        timeout=httpx.Timeout(timeout, connect=connect_timeout),
+    )
+    kwargs = {"base_url": base_url} if base_url else {}
+    return OpenAI(http_client=http_client, max_retries=max_retries, timeout=httpx.Timeout(timeout, connect=connect_timeout), **kwargs)
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = build_client(**client_settings())
+    return _client
+
+def set_client(client):
+    # install a prebuilt (or fake) client as the process-wide one
+    global _client
+    with _client_lock:
+        _client = client
+
+def close_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+# ----------------------------
+# Latency budget and circuit breaker
+#  - CHEM_BOT_LLM_DEADLINE: seconds a student waits for the model before the heuristic is shown;
+#    a call already sent keeps running in the background so its result still reaches the cache
+#    (one still queued in the dispatcher is dropped)
+#  - After CHEM_BOT_BREAKER_FAILURES consecutive failures (errors or missed deadlines) the breaker
+#    opens and the LLM is skipped for CHEM_BOT_BREAKER_COOLDOWN seconds; then a single trial
+#    call is let through (half-open) and its outcome closes or re-opens the breaker. A trial that
+#    never reports back expires after another cooldown and the next call becomes the new trial
+# ----------------------------
+DEADLINE = float(os.getenv("CHEM_BOT_LLM_DEADLINE", "8"))
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.stats = {"opens": 0, "rejected": 0}
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            now = time.monotonic()
+            if self.state != CLOSED and now - self.opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+                self.opened_at = now  # the trial's own cooldown
+                return True  # the trial call
+            if self.state == CLOSED:
+                return True
+            self.stats["rejected"] += 1
+            return False
+
+    def success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.stats["opens"] += 1
+
+    def release(self):
+        # a call that was let through was never sent (dropped from the dispatcher queue): if it was
+        # the half-open trial, reopen with the cooldown already served so the next call is the trial
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.state = OPEN
+                self.opened_at = time.monotonic() - self.cooldown
+
+    def snapshot(self):
+        with self._lock:
+            return {"state": (CLOSED, HALF_OPEN, OPEN).index(self.state), "failures": self.failures, **self.stats}
+
+_breaker = None
+
+def get_breaker():
+    global _breaker
+    if _breaker is None:
+        with _client_lock:
+            if _breaker is None:
+                _breaker = CircuitBreaker(int(os.getenv("CHEM_BOT_BREAKER_FAILURES", "5")),
+                                          float(os.getenv("CHEM_BOT_BREAKER_COOLDOWN", "30")))
+                metrics.add_collector(lambda: {f"breaker_{k}": v for k, v in get_breaker().snapshot().items()})
+    return _breaker
+
+def set_breaker(breaker: CircuitBreaker):
+    global _breaker
+    with _client_lock:
+        _breaker = breaker
+
+_dispatcher = None
+
+def get_dispatcher():
+    # every blocking LLM call goes through here (see dispatcher.py); CHEM_BOT_LLM_WORKERS caps
+    # concurrent outbound calls for the whole process (default: the connection pool size)
+    global _dispatcher
+    if _dispatcher is None:
+        with _client_lock:
+            if _dispatcher is None:
+                workers = int(os.getenv("CHEM_BOT_LLM_WORKERS", "0")) or client_settings()["pool_size"]
+                _dispatcher = Dispatcher(workers)
+                metrics.add_collector(lambda: {f"dispatcher_{k}": v for k, v in get_dispatcher().snapshot().items()})
+    return _dispatcher
@@ -0,0 +1,266 @@
+"""
+Load test: N simulated students against a real `streamlit run chem_bot.py`, backed by the fake LLM.
+
+    python load_test.py --sessions 200 --latency 1.5 --error-rate 0.02
+    python load_test.py --sessions 50 --ramp 10 --think 2 --escalate-all --json load.json
+
+Each session opens the same websocket the browser uses and replays its messages: choose
+module/group/topic, Get Question, type an answer, Get Feedback. Streamlit's AppTest keeps
+process-global runtime state, so it can't run many sessions at once; a real server can.
+Reports per-step rerun latency percentiles, throughput, server memory per session and errors.
+Needs the `websockets` package.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import fake_llm
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+STEPS = ("load", "module", "group", "topic", "get_question", "type_answer", "get_feedback")
+FALLBACK_MARKERS = ("⚠️ LLM error", "⚠️ The AI marker")  # feedback served by the heuristic instead
+ANSWER_WORDS = (30, 80, 200)
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def rss_bytes(pid: int):
+    with open(f"/proc/{pid}/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+def start_app(port: int, env: dict, timeout: float = 60.0):
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", os.path.join(HERE, "chem_bot.py"), "--server.headless", "true",
+         "--server.port", str(port), "--browser.gatherUsageStats", "false"],
+        cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as r:
+                if r.status == 200:
+                    return proc
+        except OSError:
+            if proc.poll() is not None:
+                raise RuntimeError(f"streamlit exited: {proc.stderr.read().decode(errors='replace')[-2000:]}")
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("streamlit did not become healthy")
+
+# ----------------------------
+# One simulated browser
+# ----------------------------
+class Session:
+    def __init__(self, ws, timeout: float):
+        self.ws = ws
+        self.timeout = timeout
+        self.widgets = {}  # label -> (widget id, element proto, fragment id)
+        self.values = {}  # widget id -> WidgetState kept across reruns
+        self.exceptions = []
+        self.fallback = False
+
+    async def rerun(self, trigger: str = None, fragment_id: str = ""):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.fragment_id = fragment_id
+        for state in self.values.values():
+            msg.rerun_script.widget_states.widgets.add().CopyFrom(state)
+        if trigger is not None:
+            button = msg.rerun_script.widget_states.widgets.add()
+            button.id = self.widgets[trigger][0]
+            button.trigger_value = True
+        await self.ws.send(msg.SerializeToString())
+
+        if not fragment_id:
+            self.widgets = {}
+        while True:
+            fwd = ForwardMsg()
+            fwd.ParseFromString(await asyncio.wait_for(self.ws.recv(), self.timeout))
+            kind = fwd.WhichOneof("type")
+            if kind == "script_finished":
+                if fwd.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    return
+            elif kind == "delta" and fwd.delta.WhichOneof("type") == "new_element":
+                element = fwd.delta.new_element
+                name = element.WhichOneof("type")
+                if name == "exception":
+                    self.exceptions.append(f"{element.exception.type}: {element.exception.message}"[:120])
+                elif name == "markdown" and any(m in element.markdown.body for m in FALLBACK_MARKERS):
+                    self.fallback = True
+                elif name in ("selectbox", "button", "text_area"):
+                    proto = getattr(element, name)
+                    self.widgets[proto.label] = (proto.id, proto, fwd.delta.fragment_id)
+
+    def set_value(self, label: str, value: str):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        state = WidgetState()
+        state.id = self.widgets[label][0]
+        state.string_value = value
+        self.values = {wid: s for wid, s in self.values.items() if wid in {w[0] for w in self.widgets.values()}}
+        self.values[state.id] = state
+
+    def options(self, label: str):
+        return list(self.widgets[label][1].options)
+
+async def student(i: int, url: str, results: dict, rng: random.Random, think: float, timeout: float, open_sockets: list):
+    from bench_marking import synthetic_answer
+    from question_store import get_store
+
+    ws = await websockets.connect(url, subprotocols=["streamlit"], max_size=None)
+    open_sockets.append(ws)  # held open so server memory is measured with every session live
+    s = Session(ws, timeout)
+
+    async def step(name: str, **kwargs):
+        t0 = time.perf_counter()
+        await s.rerun(**kwargs)
+        results["latency"][name].append(time.perf_counter() - t0)
+        if s.exceptions:
+            raise RuntimeError(f"{name}: {s.exceptions[0]}")
+        if think:
+            await asyncio.sleep(rng.uniform(0, 2 * think))
+
+    try:
+        await step("load")
+        chosen = {}
+        for name, label in (("module", "Choose module"), ("group", "Choose group"), ("topic", "Choose topic")):
+            options = s.options(label)
+            if not options:
+                raise RuntimeError(f"{name}: no options")
+            chosen[name] = rng.choice(options)
+            s.set_value(label, chosen[name])
+            await step(name)
+        await step("get_question", trigger="📝 Get Question")
+        # the app picks the question at random; answer with that topic's vocabulary
+        q = rng.choice(get_store().candidates(chosen["module"], chosen["group"], chosen["topic"]))
+        s.set_value("Type your answer here", synthetic_answer(q, rng.choice(ANSWER_WORDS), rng))
+        await step("type_answer", fragment_id=s.widgets["Type your answer here"][2])
+        await step("get_feedback", trigger="🔍 Get Feedback")
+        results["flows"] += 1
+        results["fallbacks"] += s.fallback
+    except Exception as e:
+        results["errors"][f"{type(e).__name__}: {e}".splitlines()[0][:120]] += 1
+
+def pct(values, p: float):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))] * 1000 if values else 0.0
+
+async def drive(url: str, sessions: int, ramp: float, think: float, timeout: float, seed: int, open_sockets: list):
+    results = {"latency": collections.defaultdict(list), "errors": collections.Counter(), "flows": 0, "fallbacks": 0}
+    tasks = []
+    for i in range(sessions):
+        tasks.append(asyncio.create_task(student(i, url, results, random.Random(seed + i), think, timeout, open_sockets)))
+        if ramp:
+            await asyncio.sleep(ramp / sessions)
+    await asyncio.gather(*tasks)
+    return results
+
+def run(sessions: int = 20, latency: float = 1.0, error_rate: float = 0.0, token_delay: float = 0.02, ramp: float = 0.0,
+        think: float = 0.0, timeout: float = 120.0, seed: int = 1234, env: dict = None, out=sys.stdout):
+    server = fake_llm.serve(latency=latency, error_rate=error_rate, token_delay=token_delay)
+    port = free_port()
+    app_env = {**os.environ, "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "load-test"),
+               "OPENAI_BASE_URL": fake_llm.base_url(server), "CHEM_BOT_CACHE_PATH": "", **(env or {})}
+    app = start_app(port, app_env)
+    url = f"ws://127.0.0.1:{port}/_stcore/stream"
+
+    async def main():
+        # one throwaway session so the baseline includes the loaded bank and imported modules
+        await drive(url, 1, 0.0, 0.0, timeout, seed - 1, [])
+        rss_before = rss_bytes(app.pid)
+        open_sockets = []
+        t0 = time.perf_counter()
+        results = await drive(url, sessions, ramp, think, timeout, seed, open_sockets)
+        wall = time.perf_counter() - t0
+        rss_after = rss_bytes(app.pid)
+        for ws in open_sockets:
+            await ws.close()
+        return results, wall, rss_before, rss_after
+
+    try:
+        results, wall, rss_before, rss_after = asyncio.run(main())
+    finally:
+        app.terminate()
+        app.wait(timeout=10)
+        server.shutdown()
+
+    latency_by_step = results["latency"]
+    reruns = sum(len(v) for v in latency_by_step.values())
+    report = {
+        "sessions": sessions,
+        "completed_flows": results["flows"],
+        "wall_seconds": round(wall, 2),
+        "flows_per_second": round(results["flows"] / wall, 2) if wall else 0.0,
+        "reruns_per_second": round(reruns / wall, 2) if wall else 0.0,
+        "memory_per_session_mb": round((rss_after - rss_before) / sessions / 2 ** 20, 2),
+        "server_rss_mb": round(rss_after / 2 ** 20, 1),
+        "llm_requests": server.requests,
+        "heuristic_fallbacks": results["fallbacks"],
+        "errors": dict(results["errors"]),
+        "steps": {
+            step: {"count": len(latency_by_step[step]), "p50_ms": pct(latency_by_step[step], 0.5),
+                   "p95_ms": pct(latency_by_step[step], 0.95), "p99_ms": pct(latency_by_step[step], 0.99),
+                   "max_ms": max(latency_by_step[step], default=0.0) * 1000}
+            for step in STEPS if latency_by_step[step]
+        },
+    }
+    print_report(report, out)
+    return report
+
+def print_report(report: dict, out=sys.stdout):
+    print(f"{report['sessions']} sessions, {report['completed_flows']} complete flows in {report['wall_seconds']}s "
+          f"({report['flows_per_second']} flows/s, {report['reruns_per_second']} reruns/s)", file=out)
+    print(f"{'step':14} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}", file=out)
+    for step, s in report["steps"].items():
+        print(f"{step:14} {s['count']:>6} {s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f} {s['p99_ms']:>9.1f} {s['max_ms']:>9.1f}", file=out)
+    print(f"memory: {report['memory_per_session_mb']} MB per session ({report['server_rss_mb']} MB server RSS)", file=out)
+    print(f"LLM: {report['llm_requests']} upstream requests, {report['heuristic_fallbacks']} flows fell back to "
+          "heuristic feedback", file=out)
+    print(f"errors: {sum(report['errors'].values())}", file=out)
+    for kind, n in sorted(report["errors"].items(), key=lambda kv: -kv[1]):
+        print(f"  {n:>5}  {kind}", file=out)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Simulate a class of students against chem_bot.py.")
+    ap.add_argument("--sessions", type=int, default=20, help="concurrent simulated students")
+    ap.add_argument("--latency", type=float, default=1.0, help="fake LLM seconds per response")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fraction of fake LLM requests answered with 429/5xx")
+    ap.add_argument("--token-delay", type=float, default=0.02, help="fake LLM seconds between streamed pieces")
+    ap.add_argument("--ramp", type=float, default=0.0, help="seconds over which sessions start")
+    ap.add_argument("--think", type=float, default=0.0, help="mean seconds a student pauses between steps")
+    ap.add_argument("--timeout", type=float, default=120.0, help="seconds allowed per rerun")
+    ap.add_argument("--escalate-all", action="store_true", help="send every answer to the LLM (no local tier)")
+    ap.add_argument("--seed", type=int, default=1234)
+    ap.add_argument("--json", default="", help="also write the report to this JSON file")
+    args = ap.parse_args(argv)
+    if websockets is None:
+        sys.exit("load_test.py needs the websockets package: pip install websockets")
+
+    env = {"CHEM_BOT_ROUTE_THRESHOLD": "2"} if args.escalate_all else {}
+    report = run(args.sessions, args.latency, args.error_rate, args.token_delay, args.ramp, args.think, args.timeout,
+                 args.seed, env)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    sys.exit(1 if report["errors"] else 0)
+
+if __name__ == "__main__":
+    main()
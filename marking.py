@@ -0,0 +1,811 @@
+import concurrent.futures
+import os
+import re
+import functools
+import threading
+import time
+
+from llm_cache import cache_key, get_cache
+from llm_client import DEADLINE, get_breaker, get_client, get_dispatcher
+import metrics
+import numeric
+import tokens
+
+# ----------------------------
+# Question bank
+#  - Paraphrased, HSC-style items covering Modules 5–8
+#  - group: Top (Band 5/6), Middle (Band 4 security), Lower (limit Band 2)
+# ----------------------------
+QUESTION_BANK = [
+    # =======================
+    # MODULE 5 — Equilibrium & Acid Reactions
+    # =======================
+    {
+        "module": "Module 5 — Equilibrium & Acid Reactions",
+        "group": "Top (Band 5/6)",
+        "topic": "Haber equilibrium & temperature",
+        "prompt": "Explain, using Le Chatelier’s principle, how increasing temperature affects the equilibrium yield of ammonia in the Haber process. (6 marks)",
+        "criteria": [
+            "Identifies forward ammonia formation as exothermic.",
+            "States correct direction of shift when temperature increases (towards endothermic direction).",
+            "Explains why: added heat favours the endothermic reaction to oppose the change.",
+            "Links shift explicitly to ammonia yield (decreases).",
+            "Uses correct terminology; avoids vague language.",
+            "Finishes with a concise concluding sentence tied to the question."
+        ],
+        "band_target": "Aim: Secure high Band 5 / push to Band 6."
+    },
+    {
+        "module": "Module 5 — Equilibrium & Acid Reactions",
+        "group": "Top (Band 5/6)",
+        "topic": "Kc interpretation",
+        "prompt": "A(aq) + B(aq) ⇌ C(aq). At 25 °C, Kc = 8.0. Discuss what this value implies about the position of equilibrium and how doubling [A] initially (with B constant) affects the initial reaction quotient, Q. (5–6 marks)",
+        "criteria": [
+            "Interprets Kc>1 as products favoured at equilibrium.",
+            "Defines Q and relates it to current concentrations.",
+            "Explains the effect of doubling [A] on Q (Q increases).",
+            "Predicts direction of change to re-establish equilibrium (shifts right).",
+            "Uses clear logic and correct terminology."
+        ],
+        "band_target": "Aim: Secure high Band 5 / push to Band 6."
+    },
+    {
+        "module": "Module 5 — Equilibrium & Acid Reactions",
+        "group": "Middle (Band 4 security)",
+        "topic": "Weak acid pH estimate",
+        "prompt": "A weak monoprotic acid HA has concentration 0.10 M with Ka = 1.8×10⁻⁵ at 25 °C. Estimate the pH, stating any assumptions. (3–4 marks)",
+        "criteria": [
+            "Sets up Ka = [H+][A−]/[HA] and weak acid approximation.",
+            "Solves for [H+] (x ≈ √(Ka·C)).",
+            "Calculates pH correctly (≈ 2.87).",
+            "States assumption that x ≪ C (validity)."
+        ],
+        "numeric": {"calc": "weak_acid_ph", "params": {"conc": 0.10, "ka": 1.8e-5}, "hint": "from x ≈ √(Ka·C)"},
+        "band_target": "Goal: Maximise chance of Band 4."
+    },
+    {
+        "module": "Module 5 — Equilibrium & Acid Reactions",
+        "group": "Lower (limit Band 2)",
+        "topic": "Le Chatelier basics",
+        "prompt": "State what Le Chatelier’s principle predicts when the temperature of an exothermic reaction mixture at equilibrium is increased. (1–2 marks)",
+        "criteria": [
+            "States system shifts to oppose the change (towards endothermic direction).",
+            "Links to a decrease in yield of exothermic products."
+        ],
+        "band_target": "Goal: Lift to Band 3; avoid Band 2."
+    },
+
+    # =======================
+    # MODULE 6 — Acid/Base Reactions
+    # =======================
+    {
+        "module": "Module 6 — Acid/Base Reactions",
+        "group": "Top (Band 5/6)",
+        "topic": "Titration curve analysis",
+        "prompt": "A weak acid is titrated with a strong base. Describe the key features of the pH curve, identify a suitable indicator, and justify your choice. (6 marks)",
+        "criteria": [
+            "Identifies initial pH > that of strong acid; buffer region present.",
+            "Notes equivalence point pH > 7 for weak acid/strong base.",
+            "Describes steep region around equivalence.",
+            "Selects appropriate indicator with transition near equivalence pH.",
+            "Justifies indicator choice referencing curve profile."
+        ],
+        "band_target": "Aim: Secure high Band 5 / push to Band 6."
+    },
+    {
+        "module": "Module 6 — Acid/Base Reactions",
+        "group": "Middle (Band 4 security)",
+        "topic": "Strong acid–base titration",
+        "prompt": "25.0 mL of HCl is completely neutralised by 30.0 mL of 0.100 M NaOH. Calculate the concentration of HCl. (3 marks)",
+        "criteria": [
+            "Balanced equation: HCl + NaOH → NaCl + H2O (1:1).",
+            "Correct moles of NaOH (n = C×V in L).",
+            "Correct [HCl] = n/V with units and sensible significant figures (≈0.120 M)."
+        ],
+        "numeric": {"calc": "titration_concentration", "params": {"acid_volume_ml": 25.0, "base_volume_ml": 30.0, "base_conc": 0.100},
+                    "hint": "using n=CV and a 1:1 ratio"},
+        "band_target": "Goal: Maximise chance of Band 4."
+    },
+    {
+        "module": "Module 6 — Acid/Base Reactions",
+        "group": "Lower (limit Band 2)",
+        "topic": "pH basics",
+        "prompt": "Define pH and state what a low pH indicates about a solution. (1–2 marks)",
+        "criteria": [
+            "Defines pH in terms of hydrogen ion concentration.",
+            "States that low pH indicates high [H+] (acidic)."
+        ],
+        "band_target": "Goal: Lift to Band 3; avoid Band 2."
+    },
+
+    # =======================
+    # MODULE 7 — Organic Chemistry
+    # =======================
+    {
+        "module": "Module 7 — Organic Chemistry",
+        "group": "Top (Band 5/6)",
+        "topic": "Reaction pathways",
+        "prompt": "Devise a reaction pathway to convert ethene to ethanoic acid. Include reagents/conditions and discuss regioselectivity or intermediate steps where relevant. (6 marks)",
+        "criteria": [
+            "Outlines hydration of ethene to ethanol (H2O/H+; suitable conditions).",
+            "Oxidation of ethanol to ethanoic acid (e.g., KMnO4 or dichromate; acidic conditions).",
+            "Mentions intermediate(s) and conditions clearly.",
+            "Discusses selectivity/side reactions where relevant.",
+            "Uses correct organic terminology and structural reasoning."
+        ],
+        "band_target": "Aim: Secure high Band 5 / push to Band 6."
+    },
+    {
+        "module": "Module 7 — Organic Chemistry",
+        "group": "Middle (Band 4 security)",
+        "topic": "Empirical formula (combustion)",
+        "prompt": "A 0.841 g sample of an unknown hydrocarbon is burned completely to form 2.64 g CO2 and 1.08 g H2O. Determine the empirical formula. (4–5 marks)",
+        "criteria": [
+            "Converts CO2 to moles C; H2O to moles H.",
+            "Determines moles of C and H in sample.",
+            "Finds simplest whole-number ratio.",
+            "States empirical formula clearly (e.g., CH2)."
+        ],
+        "numeric": {"calc": "empirical_formula", "params": {"mass_co2": 2.64, "mass_h2o": 1.08}},
+        "band_target": "Goal: Maximise chance of Band 4."
+    },
+    {
+        "module": "Module 7 — Organic Chemistry",
+        "group": "Lower (limit Band 2)",
+        "topic": "Functional groups",
+        "prompt": "Name the functional group present in ethanol and in ethanoic acid. (1–2 marks)",
+        "criteria": [
+            "Ethanol: hydroxyl (alcohol) group.",
+            "Ethanoic acid: carboxyl group."
+        ],
+        "band_target": "Goal: Lift to Band 3; avoid Band 2."
+    },
+
+    # =======================
+    # MODULE 8 — Applying Chemical Ideas
+    # =======================
+    {
+        "module": "Module 8 — Applying Chemical Ideas",
+        "group": "Top (Band 5/6)",
+        "topic": "Spectroscopy (IR/MS/NMR) synthesis",
+        "prompt": "A compound with molecular ion peak at m/z 60 shows a strong IR absorption near 1715 cm⁻¹ and an NMR quartet at δ ~4.1 (2H) with a triplet at δ ~1.3 (3H). Propose a structure and justify using the data. (6 marks)",
+        "criteria": [
+            "Interprets M⁺ peak (molecular mass).",
+            "Uses IR ~1715 cm⁻¹ to infer carbonyl (likely ester/ketone).",
+            "Uses NMR splitting/chemical shift to assign –OCH2–CH3 pattern (quartet + triplet).",
+            "Proposes plausible structure (e.g., ethyl formate/acetate where consistent).",
+            "Links each data point to the structure explicitly."
+        ],
+        "band_target": "Aim: Secure high Band 5 / push to Band 6."
+    },
+    {
+        "module": "Module 8 — Applying Chemical Ideas",
+        "group": "Middle (Band 4 security)",
+        "topic": "Qualitative analysis plan",
+        "prompt": "Outline a simple plan to identify the cation in an unknown salt using flame tests and precipitation reactions. (4 marks)",
+        "criteria": [
+            "Describes safe flame test procedure and indicates expected colours (e.g., Na⁺ yellow, K⁺ lilac, Ca²⁺ brick-red).",
+            "Explains use of precipitating reagents (e.g., NaOH, NH3) to form characteristic hydroxides/complexes.",
+            "States observation → inference logic.",
+            "Mentions confirmatory test or repetition for reliability."
+        ],
+        "band_target": "Goal: Maximise chance of Band 4."
+    },
+    {
+        "module": "Module 8 — Applying Chemical Ideas",
+        "group": "Lower (limit Band 2)",
+        "topic": "Test selection",
+        "prompt": "Which simple test could you use to distinguish between a carbonate and a chloride salt? State the expected observation. (1–2 marks)",
+        "criteria": [
+            "Adds acid to carbonate → effervescence (CO2).",
+            "No gas with chloride under same conditions."
+        ],
+        "band_target": "Goal: Lift to Band 3; avoid Band 2."
+    },
+]
+
+GROUPS = ["Top (Band 5/6)", "Middle (Band 4 security)", "Lower (limit Band 2)"]
+MODULES = sorted(set(q["module"] for q in QUESTION_BANK))
+
+def question_id(q: dict):
+    # stable, human-readable id: module number + topic slug (e.g. "m6-ph-basics")
+    num = re.search(r"Module\s+(\d+)", q["module"])
+    slug = re.sub(r"[^a-z0-9]+", "-", q["topic"].lower()).strip("-")
+    return f"m{num.group(1) if num else 0}-{slug}"
+
+for _q in QUESTION_BANK:
+    _q.setdefault("id", question_id(_q))
+QUESTIONS_BY_ID = {q["id"]: q for q in QUESTION_BANK}
+
+# ----------------------------
+# Helpers
+# ----------------------------
+def approx_equal(a, b, tol=0.02):
+    try:
+        return abs(float(a) - float(b)) <= tol
+    except Exception:
+        return False
+
+# ----------------------------
+# Criteria matching
+#  - A criterion counts as covered when any of its words (>4 letters) appears in the answer
+#  - Each question's criterion words are compiled once into an Aho–Corasick automaton,
+#    so an answer is scanned a single time regardless of how many criterion words there are
+# ----------------------------
+class CriteriaMatcher:
+    def __init__(self, criteria):
+        self.criteria = list(criteria)
+        self.word_criteria = {}
+        for i, c in enumerate(self.criteria):
+            for w in re.findall(r"[A-Za-z]+", c):
+                w = w.lower()
+                if len(w) > 4:
+                    self.word_criteria.setdefault(w, set()).add(i)
+
+        # trie of criterion words: goto transitions, failure links, and per-state outputs
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [set()]
+        for w, idx in self.word_criteria.items():
+            state = 0
+            for ch in w:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(set())
+                state = nxt
+            self._out[state] |= idx
+
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for ch, nxt in self._goto[state].items():
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] |= self._out[self._fail[nxt]]
+                queue.append(nxt)
+
+    def covered(self, answer: str):
+        hits = set()
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for ch in answer.lower():
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                hits |= out[state]
+                if len(hits) == len(self.criteria):
+                    break
+        return [i in hits for i in range(len(self.criteria))]
+
+    def split(self, answer: str):
+        strengths, misses = [], []
+        for c, hit in zip(self.criteria, self.covered(answer)):
+            (strengths if hit else misses).append(c)
+        return strengths, misses
+
+@functools.lru_cache(maxsize=None)
+def _compile_criteria(criteria: tuple):
+    return CriteriaMatcher(criteria)
+
+def criteria_matcher(q: dict):
+    return _compile_criteria(tuple(q["criteria"]))
+
+# ----------------------------
+# Build-it-up coach (identify → describe → explain → conclude)
+#  - Rules match whole words/phrases in the prompt; first match wins
+# ----------------------------
+def _keywords(*words):
+    return re.compile(r"\b(?:" + "|".join(re.escape(w) for w in words) + r")\b")
+
+SCAFFOLD_RULES = [
+    ("equilibrium", _keywords("haber", "le chatelier", "equilibrium"), [
+        "Identify: state which direction is exothermic vs endothermic.",
+        "Describe: say which way equilibrium shifts when the change happens.",
+        "Explain: why that shift opposes the change (link to energy/particles).",
+        "Conclude: state the impact on yield clearly."
+    ]),
+    ("titration curve", _keywords("titration curve", "indicator"), [
+        "Identify: the acid/base strength and expected equivalence pH.",
+        "Describe: key curve regions (initial, buffer/gradual, steep rise, equivalence).",
+        "Explain: indicator choice by matching transition range to equivalence pH.",
+        "Conclude: summarise the suitability of the indicator."
+    ]),
+    ("titration calculation", _keywords("neutralised"), [
+        "Identify: balanced equation and mole ratio.",
+        "Describe: calculate moles using n = C×V (convert mL→L).",
+        "Explain: link moles at endpoint to unknown concentration.",
+        "Conclude: report concentration with units and sensible sig. figs."
+    ]),
+    ("empirical formula", _keywords("empirical formula", "burned"), [
+        "Identify: moles of C from CO2 and H from H2O.",
+        "Describe: determine moles of each element in the sample.",
+        "Explain: find the simplest whole-number ratio.",
+        "Conclude: write the empirical formula clearly."
+    ]),
+    ("spectroscopy", _keywords("spectroscopy", "ir", "nmr", "mass spectrum"), [
+        "Identify: molecular mass (M⁺) and key IR bands.",
+        "Describe: NMR splitting/chemical shift patterns.",
+        "Explain: link evidence to fragments/functional groups.",
+        "Conclude: propose a structure that fits all data."
+    ]),
+    ("qualitative analysis", _keywords("qualitative", "identify the cation", "flame test", "flame tests"), [
+        "Identify: initial simple tests (flame colours).",
+        "Describe: precipitation/complexation steps and observations.",
+        "Explain: how each observation narrows the possibilities.",
+        "Conclude: state the most likely ion and confirmatory step."
+    ]),
+    ("carbonate vs chloride", re.compile(r"\bcarbonate\b.*\bchloride\b|\bchloride\b.*\bcarbonate\b", re.S), [
+        "Identify: the reagent to distinguish (e.g., dilute acid).",
+        "Describe: observation with carbonate (bubbles of gas).",
+        "Explain: gas is CO₂ from acid–carbonate reaction.",
+        "Conclude: chloride shows no effervescence under same conditions."
+    ]),
+]
+DEFAULT_SCAFFOLD = [
+    "Identify: name the key concept/feature.",
+    "Describe: state what happens or what the data shows.",
+    "Explain: why it happens using correct terms.",
+    "Conclude: link back to the question in one sentence."
+]
+
+@metrics.timed("build_it_up_steps")
+@functools.lru_cache(maxsize=4096)
+def build_it_up_steps(prompt: str):
+    return _resolve(SCAFFOLD_RULES, prompt.lower())[0] or DEFAULT_SCAFFOLD
+
+# ----------------------------
+# Exemplars and next steps
+# ----------------------------
+EXEMPLAR_RULES = [
+    ("spectroscopy", _keywords("spectroscopy", "spectroscopic", "ir", "nmr"),
+     "Use M⁺ to deduce molecular mass; IR ~1715 cm⁻¹ for C=O; NMR quartet (~4.1, 2H) and triplet (~1.3, 3H) suggest –OCH₂–CH₃. "
+     "Propose an ester consistent with all data and justify."),
+    ("empirical formula", _keywords("empirical formula"),
+     "n(C)=n(CO₂)=2.64/44.01=0.0600 mol; n(H)=2×n(H₂O)=2×1.08/18.02=0.120 mol. "
+     "C:H = 0.0600:0.120 = 1:2, so the empirical formula is CH₂ (check: 0.7205 g C + 0.1209 g H ≈ 0.841 g sample)."),
+    ("titration calculation", _keywords("neutralised"),
+     "HCl + NaOH → NaCl + H₂O (1:1). n(NaOH)=0.100×0.0300=0.00300 mol; thus n(HCl)=0.00300 mol. "
+     "[HCl]=n/V=0.00300/0.0250=0.120 M (3 s.f.), with units."),
+    ("haber", _keywords("haber", "le chatelier"),
+     "Because the forward reaction forming ammonia is exothermic, increasing temperature favours the endothermic reverse reaction. "
+     "By Le Chatelier’s principle, the system shifts left to absorb the added heat, decreasing the yield of ammonia."),
+]
+DEFAULT_EXEMPLAR = "A complete response will address each listed criterion clearly, using correct terminology and, where needed, working, units, and appropriate significant figures."
+
+# next steps tuned to band target (matched against band_target, not the prompt)
+NEXT_STEPS_RULES = [
+    ("avoid Band 2", re.compile(r"avoid Band 2"), [
+        "Always write something relevant for each part — no blanks.",
+        "Use correct definitions and simple, direct sentences.",
+        "Practise short 10–15 minute sets to build accuracy."
+    ]),
+    ("Band 4", re.compile(r"Band 4"), [
+        "Complete every step (identify → describe → explain → conclude).",
+        "Always show working and include units to avoid easy mark losses.",
+        "Use short, clear sentences with correct terms."
+    ]),
+]
+DEFAULT_NEXT_STEPS = [
+    "Plan your response with 2–3 bullet points before writing.",
+    "Add a final sentence that links your explanation back to the question.",
+    "Check units/significant figures where relevant."
+]
+
+# ----------------------------
+# Rubric compilation
+#  - Scaffold, exemplar, next steps and numeric targets (from q["numeric"]) are resolved once
+#    per question and stored on the record as q["rubric"]; the request path only reads it
+#  - More than one matching rule in a table is reported as a warning (first match still wins)
+# ----------------------------
+def _resolve(rules, text: str):
+    hits = [(name, value) for name, pattern, value in rules if pattern.search(text)]
+    if not hits:
+        return None, None, []
+    return hits[0][1], hits[0][0], [name for name, _ in hits]
+
+def compile_rubric(q: dict):
+    prompt = q["prompt"].lower()
+    rubric = {"warnings": []}
+    for kind, rules, text, default in (
+        ("scaffold", SCAFFOLD_RULES, prompt, DEFAULT_SCAFFOLD),
+        ("exemplar", EXEMPLAR_RULES, prompt, DEFAULT_EXEMPLAR),
+        ("next_steps", NEXT_STEPS_RULES, q.get("band_target", ""), DEFAULT_NEXT_STEPS),
+    ):
+        value, rule, matched = _resolve(rules, text)
+        rubric[kind] = value if value is not None else default
+        rubric[f"{kind}_rule"] = rule
+        if len(matched) > 1:
+            rubric["warnings"].append(f"{kind}: rules {matched} all match; using '{rule}'")
+    try:
+        rubric["numeric"] = numeric.compile_numeric(q.get("numeric"))
+    except (KeyError, TypeError, ValueError) as e:
+        rubric["numeric"] = None
+        rubric["warnings"].append(f"numeric: invalid spec {q.get('numeric')!r} ({e!r})")
+    return rubric
+
+def rubric_for(q: dict):
+    rubric = q.get("rubric")
+    if rubric is None:
+        rubric = q["rubric"] = compile_rubric(q)
+    return rubric
+
+# compile every bank question up front so the request path only does lookups
+for _q in QUESTION_BANK:
+    criteria_matcher(_q)
+    rubric_for(_q)
+
+# ----------------------------
+# Feedback generation
+#  - Uses OpenAI if OPENAI_API_KEY is set; otherwise uses heuristic fallback
+#  - LLM calls run on the process-wide dispatcher (single-flight, fair queue), bounded by the
+#    deadline and circuit breaker; the heuristic is computed while waiting, so a miss falls back at once
+# ----------------------------
+LLM_MODEL = "gpt-4o-mini"
+LLM_TEMPERATURE = 0.2
+
+# Static marker instructions: identical bytes on every call, so the provider can reuse its
+# cached prefix. Anything question- or answer-specific goes in the user message, question
+# material first (shared by every answer to that question) and the student's answer last.
+SYSTEM_PROMPT = """
+You are an experienced NSW HSC Chemistry marker.
+Tone: warm, specific, encouraging, and student-friendly.
+Return these EXACT sections, in this order, with short, useful paragraphs or bullets:
+
+### ✅ Strengths
+### ⚠️ Marks Lost (mapped to criteria)
+### 🧱 Build It Up
+### 🧠 Exemplar Response
+### 🔧 Next Steps (3 bullet points)
+### ☑️ Final Checklist
+
+Keep it concise but not superficial. Use correct terminology, mention units/sig figs when relevant,
+and always link back to the question. Aim to feel like a real teacher.
+Pitch the feedback at the target group and band goal given with the question.
+"""
+SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_PROMPT}
+
+def scaffold_text(q: dict):
+    rubric = rubric_for(q)
+    text = rubric.get("scaffold_text")
+    if text is None:
+        text = rubric["scaffold_text"] = "\n".join([f"{i+1}. {s}" for i, s in enumerate(rubric["scaffold"])])
+    return text
+
+def question_block(q: dict):
+    # the per-question part of the user message; like scaffold_text, built once and kept on the rubric
+    rubric = rubric_for(q)
+    block = rubric.get("prompt_block")
+    if block is None:
+        criteria_text = "\n- " + "\n- ".join(q["criteria"])
+        block = rubric["prompt_block"] = f"""
+TARGET GROUP: {q['group']}. TOPIC: {q['topic']}. {q['band_target']}
+
+QUESTION:
+{q['prompt']}
+
+CRITERIA:
+{criteria_text}
+
+COACHING STEPS:
+{scaffold_text(q)}
+
+STUDENT ANSWER:
+"""
+    return block
+
+def feedback_key(answer: str, q: dict):
+    # cache key for this answer to this question as it is asked now (question block and marker
+    # instructions included)
+    return cache_key(q.get("id") or question_id(q), answer, LLM_MODEL, LLM_TEMPERATURE, SYSTEM_PROMPT + question_block(q))
+
+def build_messages(answer: str, q: dict):
+    messages = [
+        SYSTEM_MESSAGE,
+        {"role": "user", "content": f"{question_block(q)}{answer}\n"},
+    ]
+    return messages, scaffold_text(q)
+
+DEADLINE_NOTE = ("⚠️ The AI marker is taking longer than usual, so here is quick feedback. "
+                 "Click **Get Feedback** again in a moment for the full response.\n\n")
+BREAKER_NOTE = "⚠️ The AI marker is temporarily unavailable, so here is quick feedback.\n\n"
+TOO_LONG_NOTE = (f"⚠️ Answers over {tokens.MAX_ANSWER_TOKENS} tokens aren't sent to the AI marker, so here is "
+                 "quick feedback. Trim your answer to the key points for the full response.\n\n")
+
+QUEUE_POLL_SECONDS = 0.25
+
+def _await(get, job, deadline: float = None, on_queue=None):
+    # get(timeout) -> result, raising TimeoutError if nothing arrived in time. Waits up to the
+    # deadline; while other jobs are queued ahead of this one, on_queue gets how many (then 0 once
+    # they have cleared). A job that goes straight to a worker never reports at all
+    end = time.monotonic() + (DEADLINE if deadline is None else deadline)
+    reported = 0
+    try:
+        while True:
+            waiting = on_queue is not None and not job.started
+            if on_queue is not None:
+                ahead = get_dispatcher().position(job) if waiting else 0
+                if ahead != reported:
+                    on_queue(ahead)
+                    reported = ahead
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError
+            try:
+                return get(min(remaining, QUEUE_POLL_SECONDS) if waiting else remaining)
+            except (TimeoutError, concurrent.futures.TimeoutError):  # distinct classes before Python 3.11
+                continue
+    finally:
+        if reported:  # the result (or the deadline) can arrive between polls
+            on_queue(0)
+
+class _Outcome:
+    # the breaker hears once per upstream call, not once per caller waiting on it: the job reports
+    # when the call finishes, unless its submitter already counted a missed deadline against it
+    def __init__(self, breaker):
+        self.breaker = breaker
+        self._reported = False
+        self._lock = threading.Lock()
+
+    def report(self, ok: bool):
+        with self._lock:
+            if self._reported:
+                return
+            self._reported = True
+        if ok:
+            self.breaker.success()
+        else:
+            self.breaker.failure()
+
+def _give_up(job, breaker, outcome: _Outcome = None):
+    # deadline missed. A call that reached the API counts against the breaker once, through the
+    # outcome of the caller that submitted it (coalesced callers pass none); one dropped from the
+    # queue was never sent, so if it was the half-open trial the next call gets to retry
+    get_dispatcher().abandon(job)
+    if job.started:
+        if outcome is not None:
+            outcome.report(False)
+        metrics.incr("llm_fallback_deadline")
+        return "deadline"
+    if job.future.cancelled():
+        breaker.release()
+    metrics.incr("llm_fallback_queued")
+    return "queued"
+
+def _complete(messages, cache, key, outcome: _Outcome):
+    # runs on a dispatcher worker; caches the result even if the caller stopped waiting
+    try:
+        completion = get_client().chat.completions.create(  # shared, pooled; reads key from env var
+            model=LLM_MODEL,
+            messages=messages,
+            temperature=LLM_TEMPERATURE,
+        )
+    except Exception:
+        outcome.report(False)
+        raise
+    outcome.report(True)
+    usage = getattr(completion, "usage", None)
+    metrics.record_usage(usage)
+    fb = completion.choices[0].message.content
+    cache.put(key, fb)
+    return fb, usage
+
+@metrics.timed("llm_feedback")
+def llm_feedback(answer: str, q: dict, timings: dict = None, deadline: float = None, session: str = "", on_queue=None):
+    # timings (if given) receives input/output token counts for the call and its source ("llm",
+    # "cache" or "heuristic"); session keys the dispatcher's fair queue, and on_queue(ahead)
+    # is called while other requests are queued ahead of it
+    timings = timings if timings is not None else {}
+    api_key = os.getenv("OPENAI_API_KEY", "").strip()
+    messages, build_text = build_messages(answer, q)
+    timings["source"] = "heuristic"
+
+    if api_key:
+        # identical (normalised) resubmissions are served from the cache without an API call
+        cache = get_cache()
+        key = feedback_key(answer, q)
+        cached = cache.get(key)
+        if cached is not None:
+            timings["source"] = "cache"
+            return cached
+        if tokens.over_limit(answer):
+            metrics.incr("llm_rejected_too_long")
+            return TOO_LONG_NOTE + heuristic_feedback(answer, q, build_text)
+        breaker = get_breaker()
+        if not breaker.allow():
+            metrics.incr("llm_fallback_breaker")
+            return BREAKER_NOTE + heuristic_feedback(answer, q, build_text)
+        metrics.incr("llm_requests")
+        # identical requests already in flight share one call
+        outcome = _Outcome(breaker)
+        job, created = get_dispatcher().submit(("complete", key), _complete, messages, cache, key, outcome,
+                                               session=session)
+        fallback = heuristic_feedback(answer, q, build_text)  # hedge: ready before we start waiting
+        try:
+            fb, usage = _await(job.future.result, job, deadline, on_queue)
+        except TimeoutError:
+            _give_up(job, breaker, outcome if created else None)
+            return DEADLINE_NOTE + fallback
+        except Exception as e:
+            metrics.incr("llm_fallback_error")  # the job has already told the breaker
+            return f"⚠️ LLM error: {e}\n\n" + fallback
+        timings["source"] = "llm"
+        timings.update(tokens.token_report(messages, fb, usage))
+        return fb
+    else:
+        return heuristic_feedback(answer, q, build_text)
+
+_DONE = object()
+
+class _Stream:
+    # One streamed completion, run as a dispatcher job and fanned out to every caller waiting on
+    # it: each reader keeps its own position, so one coalesced in late first gets the deltas that
+    # already arrived. The stream is the job's fn, which is how a coalesced caller finds it.
+    def __init__(self, messages, cache, key, outcome: _Outcome):
+        self.messages, self.cache, self.key = messages, cache, key
+        self.outcome = outcome
+        self.parts = []
+        self.usage = None
+        self.end = None  # _DONE, or the exception that ended the stream
+        self._cond = threading.Condition()
+
+    def __call__(self):
+        # runs on a dispatcher worker; the full text is the job's result
+        try:
+            stream = get_client().chat.completions.create(
+                model=LLM_MODEL,
+                messages=self.messages,
+                temperature=LLM_TEMPERATURE,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    self.usage = chunk.usage
+                    metrics.record_usage(chunk.usage)
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    with self._cond:
+                        self.parts.append(delta)
+                        self._cond.notify_all()
+        except Exception as e:
+            self.outcome.report(False)
+            self._finish(e)
+            raise
+        self.outcome.report(True)
+        text = "".join(self.parts)
+        if self.parts:
+            self.cache.put(self.key, text)
+        self._finish(_DONE)
+        return text
+
+    def _finish(self, end):
+        with self._cond:
+            self.end = end
+            self._cond.notify_all()
+
+    def get(self, i: int, timeout: float = None):
+        # -> delta i, or (once the stream ended before it) _DONE / the exception; TimeoutError if
+        # neither arrived in time
+        with self._cond:
+            if not self._cond.wait_for(lambda: i < len(self.parts) or self.end is not None, timeout):
+                raise TimeoutError
+            return self.parts[i] if i < len(self.parts) else self.end
+
+def llm_feedback_stream(answer: str, q: dict, timings: dict = None, deadline: float = None, session: str = "",
+                        on_queue=None):
+    # Same as llm_feedback, but yields text as tokens arrive (for st.write_stream).
+    # timings (if given) receives ttfb_ms / total_ms and whether the result came from cache.
+    # The deadline bounds the wait for the first token; after that the stream runs to completion
+    # (it reports its own outcome to the breaker, even if this generator is closed early).
+    timings = timings if timings is not None else {}
+    t0 = time.perf_counter()
+
+    def mark(source: str):
+        timings.setdefault("ttfb_ms", (time.perf_counter() - t0) * 1000)
+        timings["source"] = source
+
+    api_key = os.getenv("OPENAI_API_KEY", "").strip()
+    messages, build_text = build_messages(answer, q)
+    try:
+        if not api_key:
+            mark("heuristic")
+            yield heuristic_feedback(answer, q, build_text)
+            return
+
+        cache = get_cache()
+        key = feedback_key(answer, q)
+        cached = cache.get(key)
+        if cached is not None:
+            mark("cache")
+            yield cached
+            return
+
+        if tokens.over_limit(answer):
+            metrics.incr("llm_rejected_too_long")
+            mark("heuristic")
+            timings["fallback"] = "too_long"
+            yield TOO_LONG_NOTE + heuristic_feedback(answer, q, build_text)
+            return
+
+        breaker = get_breaker()
+        if not breaker.allow():
+            metrics.incr("llm_fallback_breaker")
+            mark("heuristic")
+            timings["fallback"] = "breaker"
+            yield BREAKER_NOTE + heuristic_feedback(answer, q, build_text)
+            return
+
+        metrics.incr("llm_requests")
+        job, created = get_dispatcher().submit(("stream", key), _Stream(messages, cache, key, _Outcome(breaker)),
+                                               session=session)
+        stream = job.fn  # the in-flight stream when this call was coalesced into it
+        if not created:
+            timings["coalesced"] = True
+        fallback = heuristic_feedback(answer, q, build_text)  # hedge: ready before we start waiting
+        try:
+            item = _await(functools.partial(stream.get, 0), job, deadline, on_queue)
+        except TimeoutError:
+            # a stream that already started keeps running in the background and still fills the cache
+            timings["fallback"] = _give_up(job, breaker, stream.outcome if created else None)
+            mark("heuristic")
+            yield DEADLINE_NOTE + fallback
+            return
+        i = 0
+        while item is not _DONE:
+            if isinstance(item, Exception):
+                # keep whatever already streamed, then fall back to the heuristic marker
+                metrics.incr("llm_fallback_error")
+                mark("heuristic")
+                timings["fallback"] = "error"
+                timings["error"] = str(item)
+                yield f"\n\n⚠️ LLM error: {item}\n\n" + fallback
+                return
+            mark("llm")
+            yield item
+            i += 1
+            item = stream.get(i)
+        timings.update(tokens.token_report(messages, "".join(stream.parts), stream.usage))
+    finally:
+        timings["total_ms"] = (time.perf_counter() - t0) * 1000
+        metrics.observe("llm_stream_total", timings["total_ms"] / 1000)
+        if "ttfb_ms" in timings:
+            metrics.observe("llm_stream_ttfb", timings["ttfb_ms"] / 1000)
+
+@metrics.timed("heuristic_feedback")
+def heuristic_feedback(answer: str, q: dict, build_text: str):
+    strengths, misses = criteria_matcher(q).split(answer)
+    return render_feedback(answer, q, strengths, misses)
+
+def render_feedback(answer: str, q: dict, strengths: list, misses: list):
+    # the fixed marker-style layout shared by the local (non-LLM) markers
+    rubric = rubric_for(q)
+    calc_note = numeric.calc_note(answer, rubric["numeric"]) if rubric["numeric"] else ""
+    exemplar = rubric["exemplar"]
+    next_steps = rubric["next_steps"]
+
+    strengths_text = "\n".join([f"• {s}" for s in strengths]) or "• Some relevant ideas present."
+    misses_text = "\n".join([f"• {m}" for m in misses]) or "• Only minor refinements needed."
+
+    blocks = [
+        "### ✅ Strengths",
+        strengths_text,
+        "\n### ⚠️ Marks Lost (mapped to criteria)",
+        misses_text,
+        "\n### 🧱 Build It Up",
+        "\n".join([f"{i+1}. {s}" for i, s in enumerate(rubric["scaffold"])]),
+        "\n### 🧠 Exemplar Response",
+        exemplar,
+        "\n### 🔧 Next Steps (do these on your next attempt)",
+        "\n".join([f"• {s}" for s in next_steps]),
+        "\n### ☑️ Final Checklist",
+        "• Did I answer every part of the question?\n• Did I use correct terminology and (if relevant) units/sig. figs?\n• Did I include a clear concluding/link-back sentence?"
+    ]
+    if calc_note:
+        blocks.insert(4, f"**Calculation note**\n{calc_note}")
+    return "\n".join(blocks)
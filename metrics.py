@@ -0,0 +1,135 @@
+import collections
+import contextlib
+import functools
+import os
+import threading
+import time
+
+# ----------------------------
+# Lightweight metrics
+#  - Enabled with CHEM_BOT_METRICS=1; when off, timed() returns functions unchanged and
+#    timer() is a shared no-op context, so instrumented code pays (almost) nothing
+#  - Per-stage latency keeps count/sum plus a bounded window of recent samples for p50/p95/p99
+# ----------------------------
+ENABLED = os.getenv("CHEM_BOT_METRICS", "") == "1"
+WINDOW = int(os.getenv("CHEM_BOT_METRICS_WINDOW", "4096"))
+QUANTILES = (0.5, 0.95, 0.99)
+
+_lock = threading.Lock()
+_samples = collections.defaultdict(lambda: collections.deque(maxlen=WINDOW))  # stage -> recent seconds
+_totals = collections.defaultdict(lambda: [0, 0.0])  # stage -> [count, sum seconds]
+_counters = collections.defaultdict(float)
+_collectors = []
+
+def observe(stage: str, seconds: float):
+    if not ENABLED:
+        return
+    with _lock:
+        _samples[stage].append(seconds)
+        total = _totals[stage]
+        total[0] += 1
+        total[1] += seconds
+
+def incr(name: str, value: float = 1.0):
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] += value
+
+def add_collector(fn):
+    # fn() -> {name: value}, read at snapshot/export time (e.g. cache hit counters)
+    _collectors.append(fn)
+
+_NULL = contextlib.nullcontext()
+
+@contextlib.contextmanager
+def _timer(stage: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - t0)
+
+def timer(stage: str):
+    return _timer(stage) if ENABLED else _NULL
+
+def timed(stage: str):
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(stage, time.perf_counter() - t0)
+        return wrapper
+    return decorate
+
+def record_usage(usage):
+    # OpenAI usage object (or None) -> token counters
+    if usage is None:
+        return
+    incr("llm_prompt_tokens", getattr(usage, "prompt_tokens", 0) or 0)
+    incr("llm_completion_tokens", getattr(usage, "completion_tokens", 0) or 0)
+    # prompt tokens served from the provider's prefix cache
+    incr("llm_cached_prompt_tokens", getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", 0) or 0)
+    incr("llm_calls")
+
+def _quantile(sorted_values, q: float):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+def snapshot():
+    with _lock:
+        stages = {stage: (sorted(_samples[stage]), list(total)) for stage, total in _totals.items()}
+        counters = dict(_counters)
+    for fn in _collectors:
+        try:
+            counters.update(fn())
+        except Exception:
+            pass
+    return {
+        "stages": {
+            stage: {"count": count, "mean_ms": total / count * 1000 if count else 0.0,
+                    **{f"p{int(q * 100)}_ms": _quantile(values, q) * 1000 for q in QUANTILES}}
+            for stage, (values, (count, total)) in sorted(stages.items())
+        },
+        "counters": counters,
+    }
+
+def prometheus_text():
+    snap = snapshot()
+    lines = [
+        "# HELP chem_bot_stage_seconds Latency of instrumented stages (recent window quantiles).",
+        "# TYPE chem_bot_stage_seconds summary",
+    ]
+    for stage, s in snap["stages"].items():
+        for q in QUANTILES:
+            lines.append(f'chem_bot_stage_seconds{{stage="{stage}",quantile="{q}"}} {s[f"p{int(q * 100)}_ms"] / 1000:.6f}')
+        lines.append(f'chem_bot_stage_seconds_sum{{stage="{stage}"}} {s["mean_ms"] * s["count"] / 1000:.6f}')
+        lines.append(f'chem_bot_stage_seconds_count{{stage="{stage}"}} {s["count"]}')
+    for name, value in sorted(snap["counters"].items()):
+        lines.append(f"# TYPE chem_bot_{name} gauge")
+        lines.append(f"chem_bot_{name} {value}")
+    return "\n".join(lines) + "\n"
+
+_written_at = 0.0
+
+def export(path: str = None, min_interval: float = 5.0):
+    # atomically rewrite the Prometheus text file, at most once per min_interval seconds
+    global _written_at
+    if not ENABLED:
+        return
+    now = time.monotonic()
+    if now - _written_at < min_interval:
+        return
+    _written_at = now
+    path = path or os.getenv("CHEM_BOT_METRICS_FILE", "chem_bot_metrics.prom")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(tmp, path)
@@ -0,0 +1,163 @@
+import math
+import re
+
+import numpy as np
+
+# ----------------------------
+# Numeric answer checking
+#  - A question's "numeric" spec names a calculator and its parameters; expected values and
+#    tolerances are computed once (compile_numeric) and kept on the compiled rubric
+#  - Every number in an answer (with its unit, if any) is a candidate, not just the first one
+#  - check_batch compares whole arrays of answers against all targets in one NumPy operation
+# ----------------------------
+M_C, M_H, M_O = 12.011, 1.008, 15.999
+
+def titration_concentration(acid_volume_ml: float, base_volume_ml: float, base_conc: float, mole_ratio: float = 1.0):
+    # e.g. 25.0 mL HCl neutralised by 30.0 mL 0.100 M NaOH → [HCl] = 0.120 M
+    n_base = base_conc * base_volume_ml / 1000.0
+    return {"targets": [
+        {"label": "concentration", "value": n_base * mole_ratio / (acid_volume_ml / 1000.0), "unit": "M", "rtol": 0.02},
+    ]}
+
+def weak_acid_ph(conc: float, ka: float):
+    # x ≈ √(Ka·C) when x ≪ C
+    h = math.sqrt(ka * conc)
+    return {"targets": [
+        {"label": "[H+]", "value": h, "unit": "M", "rtol": 0.05, "optional": True},
+        {"label": "pH", "value": -math.log10(h), "unit": "", "atol": 0.02},
+    ]}
+
+def empirical_formula(mass_co2: float, mass_h2o: float):
+    n_c = mass_co2 / (M_C + 2 * M_O)
+    n_h = 2 * mass_h2o / (2 * M_H + M_O)
+    ratio = n_h / n_c
+    # smallest multiplier that makes the H:C ratio (near) whole
+    mult = next((m for m in range(1, 7) if abs(ratio * m - round(ratio * m)) < 0.1), 1)
+    c, h = mult, round(ratio * mult)
+    formula = f"C{c if c > 1 else ''}H{h if h > 1 else ''}"
+    return {"formula": formula, "targets": [
+        {"label": "moles of C", "value": n_c, "unit": "mol", "rtol": 0.03},
+        {"label": "moles of H", "value": n_h, "unit": "mol", "rtol": 0.03},
+    ]}
+
+CALCULATORS = {
+    "titration_concentration": titration_concentration,
+    "weak_acid_ph": weak_acid_ph,
+    "empirical_formula": empirical_formula,
+}
+
+# ----------------------------
+# Units: scale to a base unit within a dimension (concentration in M, amount in mol, ...)
+# ----------------------------
+DIMENSIONLESS, CONCENTRATION, AMOUNT, MASS, VOLUME = 0, 1, 2, 3, 4
+NO_UNIT = -1
+
+UNITS = {
+    "": (DIMENSIONLESS, 1.0),
+    "m": (CONCENTRATION, 1.0), "mol/l": (CONCENTRATION, 1.0), "moll-1": (CONCENTRATION, 1.0),
+    "mm": (CONCENTRATION, 1e-3), "mmol/l": (CONCENTRATION, 1e-3),
+    "mol": (AMOUNT, 1.0), "mmol": (AMOUNT, 1e-3),
+    "g": (MASS, 1.0), "mg": (MASS, 1e-3), "kg": (MASS, 1e3),
+    "l": (VOLUME, 1.0), "ml": (VOLUME, 1e-3),
+}
+
+_SUPERSCRIPTS = str.maketrans("⁰¹²³⁴⁵⁶⁷⁸⁹⁻₀₁₂₃₄₅₆₇₈₉−", "0123456789-0123456789-")
+_QUANTITY = re.compile(
+    r"(?<![\w.])([-+]?(?:\d+(?:\.\d*)?|\.\d+))"
+    r"(?:\s*[eE]([-+]?\d+)|\s*[×xX*]\s*10\s*(?:\^|\*\*)?\s*([-+]?\d+))?"
+    r"(?:\s*(mol\s*/\s*L|mol\s*L\s*-1|mmol\s*/\s*L|mmol|mol|mM|M|mL|ml|L|mg|kg|g)(?![A-Za-z]))?"
+)
+
+def extract_quantities(text: str):
+    # -> [(value in base units, dimension code or NO_UNIT), ...]
+    out = []
+    for m in _QUANTITY.finditer(text.translate(_SUPERSCRIPTS)):
+        value = float(m.group(1))
+        exp = m.group(2) or m.group(3)
+        if exp:
+            value *= 10.0 ** int(exp)
+        unit = m.group(4)
+        if unit:
+            dim, scale = UNITS[re.sub(r"\s+", "", unit).lower()]
+            out.append((value * scale, dim))
+        else:
+            out.append((value, NO_UNIT))
+    return out
+
+def compile_numeric(spec: dict):
+    if not spec:
+        return None
+    result = CALCULATORS[spec["calc"]](**spec.get("params", {}))
+    targets = result["targets"]
+    values = np.array([t["value"] for t in targets], dtype=float)
+    tols = np.array([max(t.get("atol", 0.0), t.get("rtol", 0.0) * abs(t["value"])) for t in targets], dtype=float)
+    dims = np.array([UNITS[t["unit"].lower()][0] for t in targets], dtype=np.int8)
+    formula = result.get("formula")
+    return {
+        "targets": targets,
+        "values": values,
+        "tols": tols,
+        "dims": dims,
+        "formula": formula,
+        "formula_re": re.compile(rf"(?<![A-Za-z0-9]){re.escape(formula)}(?![A-Za-z0-9])") if formula else None,
+        "hint": spec.get("hint", ""),
+    }
+
+# ----------------------------
+# Checking
+# ----------------------------
+def _pad(rows):
+    k = max((len(r) for r in rows), default=0) or 1
+    vals = np.full((len(rows), k), np.nan)
+    dims = np.full((len(rows), k), NO_UNIT, dtype=np.int8)
+    for i, row in enumerate(rows):
+        if row:
+            v, d = zip(*row)
+            vals[i, :len(row)] = v
+            dims[i, :len(row)] = d
+    return vals, dims
+
+def check_batch(answers, compiled: dict):
+    # -> bool array [len(answers), n_targets]: a target is hit if any candidate number is within
+    #    tolerance and its unit (when given) has the target's dimension
+    vals, dims = _pad([extract_quantities(a) for a in answers])
+    return check_arrays(vals, dims, compiled)
+
+def check_arrays(vals, dims, compiled: dict):
+    close = np.abs(vals[:, :, None] - compiled["values"][None, None, :]) <= compiled["tols"][None, None, :]
+    unit_ok = (dims[:, :, None] == NO_UNIT) | (dims[:, :, None] == compiled["dims"][None, None, :])
+    return np.any(close & unit_ok, axis=1)
+
+def check_values(values, compiled: dict, target: int = -1):
+    # already-extracted final answers (e.g. a CSV column) against one target
+    values = np.asarray(values, dtype=float)
+    return np.abs(values - compiled["values"][target]) <= compiled["tols"][target]
+
+def check_formula(answers, compiled: dict):
+    pattern = compiled["formula_re"]
+    if pattern is None:
+        return np.zeros(len(answers), dtype=bool)
+    return np.array([bool(pattern.search(a.translate(_SUPERSCRIPTS))) for a in answers], dtype=bool)
+
+def _fmt(value: float):
+    # 3 significant figures, keeping trailing zeros (0.120, not 0.12)
+    return f"{value:#.3g}" if abs(value) >= 1e-4 else f"{value:.2e}"
+
+def calc_note(answer: str, compiled: dict, hits=None):
+    hits = check_batch([answer], compiled)[0] if hits is None else hits
+    lines = []
+    targets = [(t, hit) for t, hit in zip(compiled["targets"], hits) if hit or not t.get("optional")]
+    for t, hit in targets:
+        expected = f"≈{_fmt(t['value'])}{' ' + t['unit'] if t['unit'] else ''}"
+        if hit:
+            lines.append(f"• Your {t['label']} is close to the expected {expected}.")
+        else:
+            hint = f" {compiled['hint']}" if compiled["hint"] else ""
+            lines.append(f"• Expected {t['label']} {expected}{hint}. Show working so each step can earn marks.")
+    if compiled["formula"]:
+        if check_formula([answer], compiled)[0]:
+            lines.append(f"• Your empirical formula ({compiled['formula']}) is correct.")
+        else:
+            lines.append(f"• The data give an empirical formula of {compiled['formula']}; check your mole ratio.")
+    lines.append("• Include units and appropriate significant figures.")
+    return "\n".join(lines)
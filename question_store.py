@@ -0,0 +1,159 @@
+"""
+Question store: the bank loaded once per process, with lookup indexes.
+
+    CHEM_BOT_BANK=questions.json streamlit run chem_bot.py   # or questions.sqlite
+    python question_store.py export questions.json            # dump the built-in bank (.json or .sqlite)
+    python question_store.py check questions.json             # list ambiguous scaffold/exemplar routing
+"""
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+
+from marking import GROUPS, QUESTION_BANK, compile_rubric, criteria_matcher, question_id
+from similarity import SimilarityIndex
+
+# ----------------------------
+# Loading
+#  - JSON: a list of question dicts (or {"questions": [...]})
+#  - SQLite: table questions(id TEXT PRIMARY KEY, data TEXT) with one JSON document per row
+# ----------------------------
+def load_questions(path: str):
+    if path.endswith((".sqlite", ".sqlite3", ".db")):
+        db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            rows = db.execute("SELECT id, data FROM questions ORDER BY rowid").fetchall()
+        finally:
+            db.close()
+        return [dict(json.loads(data), id=qid) if qid else json.loads(data) for qid, data in rows]
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return data["questions"] if isinstance(data, dict) else data
+
+def _plain(q: dict):
+    # the compiled rubric is derived at load time, never stored
+    return {k: v for k, v in q.items() if k != "rubric"}
+
+def save_questions(questions, path: str):
+    if path.endswith((".sqlite", ".sqlite3", ".db")):
+        db = sqlite3.connect(path)
+        with db:
+            db.execute("CREATE TABLE IF NOT EXISTS questions (id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+            db.executemany("INSERT OR REPLACE INTO questions (id, data) VALUES (?, ?)",
+                           [(q["id"], json.dumps(_plain(q), ensure_ascii=False)) for q in questions])
+        db.close()
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([_plain(q) for q in questions], f, ensure_ascii=False, indent=2)
+
+# ----------------------------
+# Store
+# ----------------------------
+class QuestionStore:
+    def __init__(self, questions, path: str = ""):
+        self.path = path
+        self.questions = []
+        self.by_id = {}
+        self.index = {}  # module -> group -> topic -> [questions]
+        self.warnings = []  # (question id, message) from rubric compilation
+        for q in questions:
+            q = dict(q)
+            q["id"] = self._assign_id(q)
+            self.questions.append(q)
+            self.by_id[q["id"]] = q
+            self.index.setdefault(q["module"], {}).setdefault(q["group"], {}).setdefault(q["topic"], []).append(q)
+            criteria_matcher(q)
+            q["rubric"] = compile_rubric(q)
+            self.warnings += [(q["id"], w) for w in q["rubric"]["warnings"]]
+
+        self.modules = sorted(self.index)
+        self.groups = [g for g in GROUPS if any(g in groups for groups in self.index.values())]
+        self.groups += sorted({g for groups in self.index.values() for g in groups} - set(self.groups))
+        self._topics = {(m, g): sorted(topics) for m, groups in self.index.items() for g, topics in groups.items()}
+        self.similarity = SimilarityIndex(self.questions)
+
+    def _assign_id(self, q: dict):
+        # explicit ids win; otherwise the readable slug plus a hash of the prompt, so a derived id
+        # depends only on the question itself: inserting or reordering items (and hot-reloading)
+        # never moves an id to a different question. Only exact duplicates get a numeric suffix.
+        qid = q.get("id") or f"{question_id(q)}-{hashlib.sha1(q['prompt'].encode('utf-8')).hexdigest()[:8]}"
+        n = 2
+        base = qid
+        while qid in self.by_id:
+            qid = f"{base}-{n}"
+            n += 1
+        return qid
+
+    def get(self, qid: str):
+        return self.by_id.get(qid)
+
+    def topics(self, module: str, group: str):
+        return self._topics.get((module, group), [])
+
+    def candidates(self, module: str, group: str, topic: str):
+        return self.index.get(module, {}).get(group, {}).get(topic, [])
+
+    def random_question(self, module: str, group: str, topic: str):
+        candidates = self.candidates(module, group, topic)
+        return random.choice(candidates) if candidates else None
+
+# ----------------------------
+# Process-wide instance with hot reload
+# ----------------------------
+RELOAD_CHECK_SECONDS = 2.0
+
+_store = None
+_store_sig = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+def _signature(path: str):
+    sig = []
+    for p in (path, path + "-wal"):
+        try:
+            st = os.stat(p)
+            sig.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            sig.append(None)
+    return tuple(sig)
+
+def get_store(path: str = None):
+    global _store, _store_sig, _checked_at
+    path = os.getenv("CHEM_BOT_BANK", "") if path is None else path
+    now = time.monotonic()
+    if _store is not None and (not path or now - _checked_at < RELOAD_CHECK_SECONDS) and _store.path == path:
+        return _store
+    with _lock:
+        sig = _signature(path) if path else None
+        if _store is None or _store.path != path or sig != _store_sig:
+            try:
+                _store = QuestionStore(load_questions(path) if path else QUESTION_BANK, path)
+                _store_sig = sig
+            except (OSError, ValueError, KeyError, sqlite3.Error):
+                # a half-written bank file: keep serving the previous version and retry next check
+                if _store is None or _store.path != path:
+                    raise
+        _checked_at = now
+        return _store
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) == 2 and argv[0] == "export":
+        save_questions(QuestionStore(QUESTION_BANK).questions, argv[1])
+        print(f"Wrote {len(QUESTION_BANK)} questions to {argv[1]}")
+    elif len(argv) in (1, 2) and argv[0] == "check":
+        store = QuestionStore(load_questions(argv[1]) if len(argv) == 2 else QUESTION_BANK)
+        for qid, warning in store.warnings:
+            print(f"{qid}: {warning}")
+        print(f"{len(store.questions)} questions, {len(store.warnings)} rubric warnings")
+        sys.exit(1 if store.warnings else 0)
+    else:
+        sys.exit("usage: python question_store.py export <questions.json|questions.sqlite>\n"
+                 "       python question_store.py check [questions.json|questions.sqlite]")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import os
+import random
+import re
+import threading
+import time
+
+import numpy as np
+
+import metrics
+from marking import criteria_matcher, llm_feedback, llm_feedback_stream, render_feedback
+import similarity
+
+# ----------------------------
+# Tiered marking
+#  - Tier 1 (local): TF-IDF criterion confidence (similarity.py); the answer's confidence is how
+#    decisive the per-criterion calls are, and whether the keyword matcher agrees with them
+#  - Tier 2 (LLM): only when that confidence is below the question's threshold (per group, else
+#    per marks), or for a CHEM_BOT_ROUTE_AUDIT share of confident answers kept as a spot check
+#  - Escalation rate, latency saved and tier agreement are kept in stats() and exported as metrics
+#  - CHEM_BOT_ROUTING=0 sends everything straight to the LLM, as before
+# ----------------------------
+ROUTING = os.getenv("CHEM_BOT_ROUTING", "1") != "0"
+AUDIT_RATE = float(os.getenv("CHEM_BOT_ROUTE_AUDIT", "0.05"))
+
+# (max marks, threshold): short-answer items are nearly always decided locally; 5-6 mark
+# extended responses need near-certain local calls before the LLM is skipped
+MARKS_THRESHOLDS = ((2, 0.5), (4, 0.75), (99, 0.9))
+GROUP_THRESHOLDS = {}  # group -> threshold, overrides MARKS_THRESHOLDS (e.g. {"Top (Band 5/6)": 1.01})
+DEFAULT_LLM_SECONDS = 3.0  # latency assumed saved until a real LLM call has been timed
+
+_MARKS = re.compile(r"\((?:\d+\s*[–-]\s*)?(\d+)\s*marks?\)")
+
+def max_marks(q: dict):
+    if "marks" in q:
+        return int(q["marks"])
+    m = _MARKS.search(q["prompt"])
+    return int(m.group(1)) if m else 0
+
+def threshold_for(q: dict):
+    override = os.getenv("CHEM_BOT_ROUTE_THRESHOLD", "")
+    if override:
+        return float(override)
+    if "route_threshold" in q:
+        return float(q["route_threshold"])
+    if q["group"] in GROUP_THRESHOLDS:
+        return GROUP_THRESHOLDS[q["group"]]
+    marks = max_marks(q)
+    return next(t for limit, t in MARKS_THRESHOLDS if marks <= limit)
+
+def _index():
+    from question_store import get_store
+    return get_store().similarity
+
+def local_assessment(answer: str, q: dict):
+    # -> (answer confidence 0..1, per-criterion confidence, per-criterion covered)
+    conf, _ = _index().score(answer, q)
+    covered = conf >= similarity.COVERED_CONFIDENCE
+    # 0 at the covered/missed boundary, 1 when the call is clear-cut either way; a criterion the
+    # keyword matcher (heuristic_feedback) calls differently is treated as undecided, and so is one
+    # that shares no vocabulary with the answer (e.g. "uses correct terminology", "concludes"),
+    # since TF-IDF can't see a criterion met in other words
+    decisiveness = np.abs(conf - similarity.COVERED_CONFIDENCE) / np.where(
+        covered, 1 - similarity.COVERED_CONFIDENCE, similarity.COVERED_CONFIDENCE)
+    decisiveness[np.array(criteria_matcher(q).covered(answer)) != covered] = 0.0
+    decisiveness[conf <= 0.0] = 0.0
+    return (float(decisiveness.mean()) if len(conf) else 1.0), conf, covered
+
+def agreement(feedback: str, q: dict, covered):
+    # share of criteria where the LLM's Strengths / Marks Lost split matches the local call
+    # (each criterion is placed in whichever LLM section it is more similar to)
+    strengths, _, lost = feedback.partition("Marks Lost")
+    lost = lost.split("Build It Up")[0]
+    conf, _ = _index().score_batch([strengths, lost], q)
+    return float(np.mean((conf[0] > conf[1]) == covered)) if len(covered) else 1.0
+
+# ----------------------------
+# Stats
+# ----------------------------
+_lock = threading.Lock()
+_stats = {"local": 0, "escalated": 0, "audited": 0, "latency_saved_seconds": 0.0,
+          "agreement_sum": 0.0, "agreement_n": 0}
+_llm_seconds = None  # moving average of escalated call latency
+
+def _record_local(seconds: float, llm_available: bool):
+    # latency is only saved when there was an LLM call to skip (not when no API key is set)
+    with _lock:
+        _stats["local"] += 1
+        saved = max(0.0, (_llm_seconds or DEFAULT_LLM_SECONDS) - seconds) if llm_available else 0.0
+        _stats["latency_saved_seconds"] += saved
+    metrics.incr("route_local")
+    metrics.incr("route_latency_saved_seconds", saved)
+
+def _record_escalated(seconds: float, agree: float, audit: bool, from_llm: bool):
+    global _llm_seconds
+    with _lock:
+        _stats["audited" if audit else "escalated"] += 1
+        if from_llm:
+            _llm_seconds = seconds if _llm_seconds is None else 0.9 * _llm_seconds + 0.1 * seconds
+        if agree is not None:
+            _stats["agreement_sum"] += agree
+            _stats["agreement_n"] += 1
+    metrics.incr("route_audited" if audit else "route_escalated")
+
+def stats():
+    with _lock:
+        s = dict(_stats)
+    total = s["local"] + s["escalated"] + s["audited"]
+    s["escalation_rate"] = round((s["escalated"] + s["audited"]) / total, 3) if total else 0.0
+    s["agreement"] = round(s.pop("agreement_sum") / s["agreement_n"], 3) if s["agreement_n"] else 0.0
+    return s
+
+metrics.add_collector(lambda: {f"route_{k}": v for k, v in stats().items()
+                               if k in ("escalation_rate", "agreement", "latency_saved_seconds")})
+
+# ----------------------------
+# Routing
+# ----------------------------
+def _decide(answer: str, q: dict, timings: dict):
+    # -> (per-criterion confidence, covered, tier) where tier is "local", "llm" or "audit"
+    with metrics.timer("route_local_score"):
+        confidence, conf, covered = local_assessment(answer, q)
+    timings["confidence"] = round(confidence, 3)
+    timings["threshold"] = threshold_for(q)
+    timings["llm_available"] = bool(os.getenv("OPENAI_API_KEY", "").strip())
+    if not timings["llm_available"]:
+        tier = "local"
+    elif not ROUTING or confidence < timings["threshold"]:
+        tier = "llm"
+    else:
+        tier = "audit" if random.random() < AUDIT_RATE else "local"
+    timings["tier"] = tier
+    return conf, covered, tier
+
+def routed_feedback(answer: str, q: dict, timings: dict = None, session: str = "", on_queue=None):
+    timings = timings if timings is not None else {}
+    t0 = time.perf_counter()
+    conf, covered, tier = _decide(answer, q, timings)
+    if tier == "local":
+        fb = render_feedback(answer, q, *similarity.split(q, conf))
+        _record_local(time.perf_counter() - t0, timings["llm_available"])
+        return fb
+    fb = llm_feedback(answer, q, timings, session=session, on_queue=on_queue)
+    from_llm = timings.get("source") == "llm"  # not a cache hit or a heuristic fallback
+    _record_escalated(time.perf_counter() - t0, agreement(fb, q, covered) if from_llm else None, tier == "audit", from_llm)
+    return fb
+
+def routed_feedback_stream(answer: str, q: dict, timings: dict = None, session: str = "", on_queue=None):
+    # streaming counterpart (for st.write_stream); timings also gets llm_feedback_stream's fields
+    timings = timings if timings is not None else {}
+    t0 = time.perf_counter()
+    conf, covered, tier = _decide(answer, q, timings)
+    if tier == "local":
+        timings["source"] = "local"
+        fb = render_feedback(answer, q, *similarity.split(q, conf))
+        timings["ttfb_ms"] = timings["total_ms"] = (time.perf_counter() - t0) * 1000
+        _record_local(time.perf_counter() - t0, timings["llm_available"])
+        yield fb
+        return
+    parts = []
+    for part in llm_feedback_stream(answer, q, timings, session=session, on_queue=on_queue):
+        parts.append(part)
+        yield part
+    from_llm = timings.get("source") == "llm"
+    _record_escalated(time.perf_counter() - t0, agreement("".join(parts), q, covered) if from_llm else None,
+                      tier == "audit", from_llm)
@@ -0,0 +1,140 @@
+import collections
+import functools
+import math
+import re
+
+import numpy as np
+
+from marking import render_feedback, rubric_for
+
+# ----------------------------
+# Local TF-IDF scorer
+#  - Offline alternative to the LLM: criteria and exemplars are vectorised once when the bank
+#    loads (IDF over the whole bank); an answer is scored against all of its question's criteria
+#    with one matrix product
+#  - Confidence is the share of a criterion's TF-IDF mass whose terms appear in the answer
+#    (so long answers aren't penalised), scaled so FULL_COVERAGE counts as certain; a criterion
+#    is treated as covered at COVERED_CONFIDENCE or above
+# ----------------------------
+FULL_COVERAGE = 0.6
+COVERED_CONFIDENCE = 0.5
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in into is it its of on or that the their then there these this to
+was were when which while will with e g eg i ie use uses using state states clearly correct correctly
+""".split())
+
+_TOKEN = re.compile(r"[a-z][a-z0-9]*")
+
+@functools.lru_cache(maxsize=65536)
+def stem(word: str):
+    for suffix, repl in (("ations", "ate"), ("ation", "ate"), ("ies", "y"), ("ing", ""), ("es", ""), ("ed", ""), ("ly", ""), ("s", "")):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: len(word) - len(suffix)] + repl
+    return word
+
+def tokenize(text: str):
+    return [stem(w) for w in _TOKEN.findall(text.lower()) if w not in STOPWORDS]
+
+class QuestionVectors:
+    def __init__(self, vocab: dict, criteria: np.ndarray, exemplar: np.ndarray):
+        self.vocab = vocab          # token -> column
+        self.criteria = criteria    # [n_criteria, V] L2-normalised
+        self.mass = criteria ** 2   # per-term share of each criterion (rows sum to 1)
+        self.exemplar = exemplar    # [V] L2-normalised
+
+class SimilarityIndex:
+    def __init__(self, questions):
+        docs = {}
+        for q in questions:
+            docs[q["id"]] = [tokenize(c) for c in q["criteria"]] + [tokenize(rubric_for(q)["exemplar"])]
+        df = collections.Counter(t for doc_list in docs.values() for doc in doc_list for t in set(doc))
+        n = sum(len(doc_list) for doc_list in docs.values())
+        self.idf = {t: math.log((1 + n) / (1 + c)) + 1 for t, c in df.items()}
+        self.unseen_idf = math.log(1 + n) + 1
+        self._by_id = {qid: self._vectorise(doc_list) for qid, doc_list in docs.items()}
+
+    def _weights(self, tokens):
+        counts = collections.Counter(tokens)
+        return {t: (1 + math.log(c)) * self.idf.get(t, self.unseen_idf) for t, c in counts.items()}
+
+    def _vectorise(self, doc_list):
+        vocab = {t: i for i, t in enumerate(sorted({t for doc in doc_list for t in doc}))}
+        mat = np.zeros((len(doc_list), max(len(vocab), 1)), dtype=np.float32)
+        for row, doc in enumerate(doc_list):
+            for t, w in self._weights(doc).items():
+                mat[row, vocab[t]] = w
+        norms = np.linalg.norm(mat, axis=1, keepdims=True)
+        mat /= np.where(norms == 0, 1, norms)
+        return QuestionVectors(vocab, mat[:-1], mat[-1])
+
+    def vectors(self, q: dict):
+        vec = self._by_id.get(q["id"])
+        if vec is None:
+            # a question that wasn't in the bank at load time: vectorise with the bank's IDF
+            doc_list = [tokenize(c) for c in q["criteria"]] + [tokenize(rubric_for(q)["exemplar"])]
+            vec = self._by_id[q["id"]] = self._vectorise(doc_list)
+        return vec
+
+    def score_batch(self, answers, q: dict):
+        # -> (confidence [n_answers, n_criteria], cosine similarity to the exemplar [n_answers])
+        vec = self.vectors(q)
+        mat = np.zeros((len(answers), vec.criteria.shape[1]), dtype=np.float32)
+        norms = np.ones(len(answers), dtype=np.float32)
+        for i, answer in enumerate(answers):
+            weights = self._weights(tokenize(answer))
+            if not weights:
+                continue
+            norms[i] = math.sqrt(sum(w * w for w in weights.values()))
+            for t, w in weights.items():
+                col = vec.vocab.get(t)
+                if col is not None:
+                    mat[i, col] = w
+        confidence = np.clip(((mat > 0) @ vec.mass.T) / FULL_COVERAGE, 0.0, 1.0)
+        return confidence, (mat / norms[:, None]) @ vec.exemplar
+
+    def score(self, answer: str, q: dict):
+        confidence, exemplar = self.score_batch([answer], q)
+        return confidence[0], float(exemplar[0])
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+class LiveCoverage:
+    # per-criterion confidence for one question, kept up to date while the answer is edited:
+    # each sentence's question-vocabulary terms are cached, so an edit only re-tokenises the
+    # sentences that changed, and the result equals SimilarityIndex.score on the whole answer
+    def __init__(self, q: dict, index: SimilarityIndex):
+        self.q = q
+        self.index = index
+        self.vec = index.vectors(q)
+        self._segments = {}  # sentence -> frozenset of vocab columns it contains
+        self.retokenised = 0  # sentences tokenised by the last update
+
+    def update(self, text: str):
+        segments = {}
+        self.retokenised = 0
+        for s in _SENTENCE.split(text):
+            if not s or s in segments:
+                continue
+            cols = self._segments.get(s)
+            if cols is None:
+                cols = frozenset(c for c in map(self.vec.vocab.get, tokenize(s)) if c is not None)
+                self.retokenised += 1
+            segments[s] = cols
+        self._segments = segments
+        present = np.zeros(self.vec.mass.shape[1], dtype=bool)
+        present[list(frozenset().union(*segments.values()))] = True
+        return np.clip(self.vec.mass[:, present].sum(axis=1) / FULL_COVERAGE, 0.0, 1.0)
+
+def split(q: dict, confidence):
+    strengths, misses = [], []
+    for c, conf in zip(q["criteria"], confidence):
+        (strengths if conf >= COVERED_CONFIDENCE else misses).append(f"{c} ({conf:.0%} confidence)")
+    return strengths, misses
+
+def local_feedback(answer: str, q: dict, index: SimilarityIndex = None):
+    if index is None:
+        from question_store import get_store
+        index = get_store().similarity
+    confidence, _ = index.score(answer, q)
+    return render_feedback(answer, q, *split(q, confidence))
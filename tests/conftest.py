@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# the app's modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fake_llm  # noqa: E402
+
+@pytest.fixture
+def fake_server():
+    # a local OpenAI-compatible stub (fake_llm.py); tests adjust latency etc. on the returned server
+    server = fake_llm.serve()
+    yield server
+    server.shutdown()
+    server.server_close()
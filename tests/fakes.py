@@ -0,0 +1,22 @@
+from types import SimpleNamespace
+
+import marking
+
+Q = marking.QUESTION_BANK[0]
+
+class FakeClient:
+    # stands in for the OpenAI client: reply(**request) returns a completion or a chunk iterator
+    def __init__(self, reply):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+        self._reply = reply
+
+    def _create(self, **request):
+        self.calls += 1
+        return self._reply(**request)
+
+def completion(text):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))], usage=None)
+
+def chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=None)
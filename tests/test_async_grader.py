@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+import async_grader
+import fake_llm
+import llm_cache
+from async_grader import AsyncGrader, TokenBucket
+from fakes import Q, FakeClient, completion
+
+@pytest.fixture
+def clock(monkeypatch):
+    # a virtual clock: asyncio.sleep advances it instead of waiting
+    now = [0.0]
+
+    async def sleep(seconds):
+        now[0] += seconds
+    monkeypatch.setattr(async_grader.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(async_grader.asyncio, "sleep", sleep)
+    return now
+
+def test_bucket_spends_capacity_then_refills(clock):
+    async def run():
+        bucket = TokenBucket(per_minute=60)  # 1 per second, capacity 60
+        await bucket.acquire(60)
+        assert clock[0] == 0.0
+        await bucket.acquire(3)
+        assert clock[0] == pytest.approx(3.0)
+    asyncio.run(run())
+
+def test_bucket_caps_requests_at_capacity(clock):
+    async def run():
+        bucket = TokenBucket(per_minute=60, capacity=10)
+        await bucket.acquire(500)  # more than it can ever hold: waits for a full bucket only
+        assert bucket.level == pytest.approx(0.0)
+    asyncio.run(run())
+
+def test_bucket_adjust_can_go_negative(clock):
+    async def run():
+        bucket = TokenBucket(per_minute=60, capacity=10)
+        await bucket.acquire(10)
+        bucket.adjust(5)  # actual usage was 5 over the estimate
+        await bucket.acquire(1)
+        assert clock[0] == pytest.approx(6.0)
+    asyncio.run(run())
+
+def test_grader_leaves_caller_client_open_and_sends_no_max_tokens(monkeypatch):
+    monkeypatch.setattr(llm_cache, "_default_cache", llm_cache.FeedbackCache())
+    requests = []
+
+    async def reply(**request):
+        requests.append(request)
+        return completion("feedback")
+    client = FakeClient(reply)
+    closed = []
+
+    async def close():
+        closed.append(True)
+    client.close = close
+
+    async def run():
+        grader = AsyncGrader(client=client)
+        results = await grader.grade_many([("the forward reaction is exothermic", Q)])
+        await grader.aclose()
+        return results
+    [result] = asyncio.run(run())
+    assert result["source"] == "llm" and result["feedback"] == "feedback"
+    assert "max_tokens" not in requests[0]
+    assert not closed
+
+@pytest.fixture
+def stub(monkeypatch, fake_server):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("OPENAI_BASE_URL", fake_llm.base_url(fake_server))
+    monkeypatch.setattr(llm_cache, "_default_cache", llm_cache.FeedbackCache())
+    return fake_server
+
+def test_duplicates_share_one_upstream_call(stub):
+    stub.latency = 0.05
+    results = async_grader.grade_all([("the forward reaction is exothermic", Q)] * 100, concurrency=8)
+    assert stub.requests == 1
+    assert all(r["feedback"] == fake_llm.FAKE_FEEDBACK for r in results)
+    assert sum(r["source"] == "llm" for r in results) == 1
+
+def test_distinct_answers_are_each_marked_in_order(stub):
+    answers = [f"attempt {i}: the forward reaction is exothermic" for i in range(20)]
+    results = async_grader.grade_all([(a, Q) for a in answers], concurrency=4)
+    assert stub.requests == 20
+    assert [r["source"] for r in results] == ["llm"] * 20
+    assert async_grader.grade_all([(answers[0], Q)])[0]["source"] == "cache"
+
+def test_errors_retry_then_fall_back(stub):
+    stub.error_rate = 1.0
+    [result] = async_grader.grade_all([("the forward reaction is exothermic", Q)], max_attempts=3,
+                                      base_delay=0.001, max_delay=0.001)
+    assert stub.requests == 3
+    assert result["source"] == "heuristic" and result["attempts"] == 3
+    assert result["feedback"].startswith("⚠️ LLM error: ")
+
+def test_grade_without_a_semaphore_is_still_bounded(monkeypatch):
+    monkeypatch.setattr(llm_cache, "_default_cache", llm_cache.FeedbackCache())
+    active, peak = [0], [0]
+
+    async def reply(**_):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(0.01)
+        active[0] -= 1
+        return completion("feedback")
+
+    async def run():
+        grader = AsyncGrader(concurrency=3, client=FakeClient(reply))
+        return await asyncio.gather(*(grader.grade(f"answer {i}", Q) for i in range(12)))
+    results = asyncio.run(run())
+    assert [r["source"] for r in results] == ["llm"] * 12
+    assert peak[0] == 3
@@ -0,0 +1,59 @@
+import csv
+import io
+import json
+
+import batch_mark
+import marking
+
+def write_answers(path, n):
+    qids = [q["id"] for q in marking.QUESTION_BANK]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, ["question_id", "student_id", "answer"])
+        w.writeheader()
+        for i in range(n):
+            w.writerow({"question_id": qids[i % len(qids)], "student_id": f"s{i}",
+                        "answer": f"attempt {i}: the forward reaction is exothermic, so equilibrium shifts left"})
+
+def read_results(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+def test_resume_offset_counts_complete_lines(tmp_path):
+    out = tmp_path / "out.jsonl"
+    assert batch_mark.resume_offset(str(out)) == 0
+    out.write_text('{"row": 0}\n{"row": 1}\n', encoding="utf-8")
+    assert batch_mark.resume_offset(str(out)) == 2
+    assert out.read_text(encoding="utf-8") == '{"row": 0}\n{"row": 1}\n'
+
+def test_resume_offset_cuts_a_torn_line(tmp_path):
+    out = tmp_path / "out.jsonl"
+    out.write_text('{"row": 0}\n{"row": 1}\n{"row": 2, "feedb', encoding="utf-8")
+    assert batch_mark.resume_offset(str(out)) == 2
+    assert out.read_text(encoding="utf-8") == '{"row": 0}\n{"row": 1}\n'
+
+def test_resume_offset_stops_at_a_corrupt_line(tmp_path):
+    out = tmp_path / "out.jsonl"
+    out.write_text('{"row": 0}\nnot json\n{"row": 2}\n', encoding="utf-8")
+    assert batch_mark.resume_offset(str(out)) == 1
+    assert out.read_text(encoding="utf-8") == '{"row": 0}\n'
+
+def test_interrupted_run_resumes_to_the_same_output(tmp_path):
+    answers, full, partial = tmp_path / "answers.csv", tmp_path / "full.jsonl", tmp_path / "partial.jsonl"
+    write_answers(answers, 30)
+    batch_mark.run(str(answers), str(full), workers=2, chunk_size=4, log=io.StringIO())
+    expected = full.read_text(encoding="utf-8")
+
+    # a crash after 10 rows, part-way through writing the 11th
+    lines = expected.splitlines(keepends=True)
+    partial.write_text("".join(lines[:10]) + lines[10][:25], encoding="utf-8")
+    summary = batch_mark.run(str(answers), str(partial), workers=2, chunk_size=4, log=io.StringIO())
+    assert summary["skipped"] == 10 and summary["rows"] == 20
+    assert partial.read_text(encoding="utf-8") == expected
+    assert [r["row"] for r in read_results(partial)] == list(range(30))
+
+def test_unknown_question_is_reported_per_row(tmp_path):
+    answers, out = tmp_path / "answers.jsonl", tmp_path / "out.jsonl"
+    answers.write_text(json.dumps({"question_id": "nope", "student_id": "s1", "answer": "x"}) + "\n", encoding="utf-8")
+    batch_mark.run(str(answers), str(out), workers=1, log=io.StringIO())
+    [rec] = read_results(out)
+    assert rec["error"] == "unknown question_id 'nope'" and "feedback" not in rec
@@ -0,0 +1,77 @@
+import threading
+
+from dispatcher import Dispatcher
+
+def blocker(dispatcher, session="busy"):
+    # occupies one worker until the returned event is set
+    release, started = threading.Event(), threading.Event()
+
+    def hold():
+        started.set()
+        release.wait(5)
+    job, _ = dispatcher.submit(("hold", session), hold, session=session)
+    assert started.wait(5)
+    return job, release
+
+def test_identical_keys_share_one_call():
+    d = Dispatcher(workers=1)
+    _, release = blocker(d)
+    calls = []
+    first, created = d.submit("k", calls.append, 1)
+    second, coalesced = d.submit("k", calls.append, 2)
+    assert created and not coalesced
+    assert second is first and first.waiters == 2
+    release.set()
+    first.future.result(5)
+    assert calls == [1]
+    assert d.snapshot()["coalesced"] == 1
+
+def test_finished_key_runs_again():
+    d = Dispatcher(workers=1)
+    job, _ = d.submit("k", lambda: 1)
+    job.future.result(5)
+    again, created = d.submit("k", lambda: 2)
+    assert created and again.future.result(5) == 2
+
+def test_sessions_are_served_round_robin():
+    d = Dispatcher(workers=1)
+    _, release = blocker(d)
+    order = []
+    a1, _ = d.submit("a1", order.append, "a1", session="a")
+    a2, _ = d.submit("a2", order.append, "a2", session="a")
+    b1, _ = d.submit("b1", order.append, "b1", session="b")
+    assert [d.position(j) for j in (a1, b1, a2)] == [0, 1, 2]
+    release.set()
+    a2.future.result(5)
+    assert order == ["a1", "b1", "a2"]
+    assert d.position(a2) == 0
+
+def test_abandoned_queued_job_is_dropped():
+    d = Dispatcher(workers=1)
+    _, release = blocker(d)
+    calls = []
+    job, _ = d.submit("k", calls.append, 1)
+    d.abandon(job)
+    assert job.future.cancelled()
+    release.set()
+    d.submit("after", calls.append, 2)[0].future.result(5)
+    assert calls == [2]
+    assert d.snapshot()["cancelled"] == 1
+
+def test_abandon_keeps_job_with_other_waiters():
+    d = Dispatcher(workers=1)
+    _, release = blocker(d)
+    job, _ = d.submit("k", lambda: "done")
+    d.submit("k", lambda: "unused")
+    d.abandon(job)
+    assert not job.future.cancelled()
+    release.set()
+    assert job.future.result(5) == "done"
+
+def test_abandon_leaves_running_job_alone():
+    d = Dispatcher(workers=1)
+    job, release = blocker(d)
+    d.abandon(job)
+    release.set()
+    assert job.future.result(5) is None
+    assert d.snapshot()["cancelled"] == 0
@@ -0,0 +1,75 @@
+import pytest
+
+import llm_cache
+import marking
+from llm_cache import FeedbackCache, cache_key
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    return now
+
+def test_key_ignores_whitespace_and_case():
+    assert cache_key("q1", "  The  Answer\n", "m", 0.2) == cache_key("q1", "the answer", "m", 0.2)
+    assert cache_key("q1", "the answer", "m", 0.2) != cache_key("q2", "the answer", "m", 0.2)
+    assert cache_key("q1", "the answer", "m", 0.2) != cache_key("q1", "the answer", "m", 0.7)
+    assert cache_key("q1", "the answer", "m", 0.2, "prompt v1") != cache_key("q1", "the answer", "m", 0.2, "prompt v2")
+
+def edited(q: dict, **changes):
+    # the same question (same id) after an edit, as a hot-reloaded bank would hold it
+    return dict({k: v for k, v in q.items() if k != "rubric"}, **changes)
+
+def test_feedback_key_changes_when_the_question_is_edited():
+    q = next(q for q in marking.QUESTION_BANK if q["id"] == "m7-empirical-formula-combustion")
+    answer = "The empirical formula is CH2."
+    key = marking.feedback_key(answer, q)
+    assert marking.feedback_key(answer, edited(q)) == key
+    assert marking.feedback_key(answer, edited(q, prompt=q["prompt"].replace("0.841", "0.780"))) != key
+    assert marking.feedback_key(answer, edited(q, criteria=q["criteria"][:-1])) != key
+
+def test_feedback_key_changes_with_the_marker_instructions(monkeypatch):
+    q = marking.QUESTION_BANK[0]
+    key = marking.feedback_key("an answer", q)
+    monkeypatch.setattr(marking, "SYSTEM_PROMPT", marking.SYSTEM_PROMPT + "Be brief.")
+    assert marking.feedback_key("an answer", q) != key
+
+def test_memory_lru_evicts_least_recently_used():
+    cache = FeedbackCache(max_memory_items=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"
+    cache.put("c", "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A" and cache.get("c") == "C"
+
+def test_entries_expire_after_ttl(clock):
+    cache = FeedbackCache(ttl_seconds=60)
+    cache.put("a", "A")
+    clock[0] += 59
+    assert cache.get("a") == "A"
+    clock[0] += 2
+    assert cache.get("a") is None
+    assert cache.snapshot()["misses"] == 1
+
+def test_disk_survives_a_new_instance(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    FeedbackCache(path).put("a", "A")
+    cache = FeedbackCache(path)
+    assert cache.get("a") == "A"
+    assert cache.get("a") == "A"
+    assert cache.snapshot() == {"memory_hits": 1, "disk_hits": 1, "misses": 0, "evictions": 0, "hit_rate": 1.0}
+
+def test_disk_evicts_least_recently_accessed(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite")
+    cache = FeedbackCache(path, max_memory_items=1, max_disk_items=2)
+    cache.put("a", "A")
+    clock[0] += 1
+    cache.put("b", "B")
+    clock[0] += 1
+    assert cache.get("a") == "A"  # from disk; now more recent than b
+    clock[0] += 1
+    cache.put("c", "C")
+    fresh = FeedbackCache(path)
+    assert fresh.get("b") is None
+    assert fresh.get("a") == "A" and fresh.get("c") == "C"
@@ -0,0 +1,125 @@
+import threading
+
+import pytest
+
+import fake_llm
+import llm_cache
+import llm_client
+import marking
+from fakes import Q
+from llm_client import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_client.time, "monotonic", lambda: now[0])
+    return now
+
+def opened(clock, failures=2, cooldown=30.0):
+    breaker = CircuitBreaker(failures, cooldown)
+    for _ in range(failures):
+        breaker.failure()
+    assert breaker.state == OPEN
+    return breaker
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(3, 30.0)
+    breaker.failure()
+    breaker.failure()
+    breaker.success()
+    breaker.failure()
+    breaker.failure()
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.snapshot()["rejected"] == 1
+
+def test_one_trial_after_cooldown(clock):
+    breaker = opened(clock)
+    clock[0] += 29
+    assert not breaker.allow()
+    clock[0] += 1
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+
+def test_trial_outcome_closes_or_reopens(clock):
+    breaker = opened(clock)
+    clock[0] += 30
+    breaker.allow()
+    breaker.success()
+    assert breaker.state == CLOSED and breaker.allow()
+
+    breaker = opened(clock)
+    clock[0] += 30
+    breaker.allow()
+    breaker.failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.snapshot()["opens"] == 2
+
+def test_unreported_trial_expires(clock):
+    breaker = opened(clock)
+    clock[0] += 30
+    assert breaker.allow()
+    clock[0] += 29
+    assert not breaker.allow()
+    clock[0] += 1
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+
+def test_released_trial_lets_the_next_call_retry(clock):
+    breaker = opened(clock)
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == OPEN
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+
+def test_release_ignored_unless_half_open(clock):
+    breaker = CircuitBreaker(2, 30.0)
+    breaker.release()
+    assert breaker.state == CLOSED
+    breaker = opened(clock)
+    breaker.release()
+    assert not breaker.allow()
+
+def test_one_client_per_process(monkeypatch, fake_server):
+    monkeypatch.setenv("OPENAI_BASE_URL", fake_llm.base_url(fake_server))
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(llm_client, "_client", None)
+    client = llm_client.get_client()
+    assert llm_client.get_client() is client
+    llm_client.close_client()
+    assert llm_client._client is None
+
+def test_pooled_connections_are_reused(monkeypatch, fake_server):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    fake_server.latency = 0.005
+    client = llm_client.build_client(pool_size=4, max_retries=0, base_url=fake_llm.base_url(fake_server))
+
+    def call():
+        for _ in range(10):
+            client.chat.completions.create(model="m", messages=[{"role": "user", "content": "hi"}])
+    threads = [threading.Thread(target=call) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(30)
+    client.close()
+    assert fake_server.requests == 80
+    assert len(fake_server.connections) <= 4  # at most pool_size sockets, each reused
+
+def test_llm_feedback_through_the_stub(monkeypatch, fake_server):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(llm_client, "_client", llm_client.build_client(base_url=fake_llm.base_url(fake_server)))
+    monkeypatch.setattr(llm_cache, "_default_cache", llm_cache.FeedbackCache())
+    monkeypatch.setattr(llm_client, "_breaker", llm_client.CircuitBreaker())
+    timings = {}
+    assert marking.llm_feedback("the forward reaction is exothermic", Q, timings) == fake_llm.FAKE_FEEDBACK
+    assert timings["source"] == "llm" and timings["input_tokens"] > 0
+    streamed = "".join(marking.llm_feedback_stream("the reverse reaction is endothermic", Q, timings))
+    assert streamed == fake_llm.FAKE_FEEDBACK
+    assert fake_server.requests == 2
@@ -0,0 +1,79 @@
+import random
+import re
+
+import pytest
+
+import marking
+import question_store
+from marking import CriteriaMatcher, compile_rubric, criteria_matcher
+
+def substring_scan(answer: str, criteria):
+    # the original heuristic: a criterion is covered when any of its >4-letter words occurs
+    # anywhere in the lowered answer
+    return [any(w in answer.lower() for w in (w.lower() for w in re.findall(r"[A-Za-z]+", c)) if len(w) > 4)
+            for c in criteria]
+
+def sample_answers(q: dict, rng: random.Random, n: int = 40):
+    words = re.findall(r"[A-Za-z]+", " ".join(q["criteria"]) + " " + q["prompt"])
+    yield ""
+    yield q["prompt"]
+    yield " ".join(q["criteria"])
+    yield marking.rubric_for(q)["exemplar"]
+    for _ in range(n):
+        picked = rng.sample(words, min(len(words), rng.randint(1, 12)))
+        # fragments, case changes and glued words exercise substring (not whole-word) matching
+        yield "".join(rng.choice([w, w.upper(), w[: rng.randint(1, len(w))], w + " ", "x" + w]) for w in picked)
+
+@pytest.mark.parametrize("q", marking.QUESTION_BANK, ids=lambda q: q["id"])
+def test_matcher_agrees_with_substring_scan(q):
+    rng = random.Random(q["id"])
+    matcher = criteria_matcher(q)
+    for answer in sample_answers(q, rng):
+        assert matcher.covered(answer) == substring_scan(answer, q["criteria"]), answer
+
+def test_overlapping_words_are_all_found():
+    matcher = CriteriaMatcher(["exothermic reaction", "thermic effects", "reactions shift"])
+    assert matcher.covered("EXOTHERMIC") == [True, True, False]
+    assert matcher.covered("the reactionsshift") == [True, False, True]
+
+def test_split_keeps_criterion_order():
+    q = marking.QUESTION_BANK[0]
+    strengths, misses = criteria_matcher(q).split("The forward reaction is exothermic.")
+    assert strengths + misses != []
+    assert [c for c in q["criteria"] if c in strengths] == strengths
+    assert [c for c in q["criteria"] if c in misses] == misses
+
+def test_built_in_bank_compiles_without_warnings():
+    warnings = {q["id"]: compile_rubric(q)["warnings"] for q in marking.QUESTION_BANK}
+    assert not any(warnings.values()), warnings
+
+def test_rules_match_whole_words():
+    q = next(q for q in marking.QUESTION_BANK if q["id"] == "m7-empirical-formula-combustion")
+    rubric = compile_rubric(q)
+    assert rubric["exemplar_rule"] == "empirical formula"  # not "spectroscopy" via the "ir" in "empirical"
+    curve = next(q for q in marking.QUESTION_BANK if q["id"] == "m6-titration-curve-analysis")
+    assert compile_rubric(curve)["scaffold_rule"] == "titration curve"
+    assert compile_rubric(curve)["numeric"] is None
+
+def test_ambiguous_routing_is_warned_and_first_rule_used():
+    q = dict(marking.QUESTION_BANK[0], prompt="Use the Haber process data and a suitable indicator. (4 marks)")
+    rubric = compile_rubric(q)
+    assert rubric["scaffold_rule"] == "equilibrium"
+    assert rubric["warnings"] == ["scaffold: rules ['equilibrium', 'titration curve'] all match; using 'equilibrium'"]
+
+def test_invalid_numeric_spec_is_warned():
+    q = dict(marking.QUESTION_BANK[0], numeric={"calc": "no_such_calculator", "params": {}})
+    rubric = compile_rubric(q)
+    assert rubric["numeric"] is None
+    assert rubric["warnings"][0].startswith("numeric: invalid spec")
+
+def test_check_command_exit_status(tmp_path, capsys):
+    with pytest.raises(SystemExit) as exit_:
+        question_store.main(["check"])
+    assert exit_.value.code == 0
+    bank = tmp_path / "bank.json"
+    question_store.save_questions([dict(marking.QUESTION_BANK[0], prompt="Haber process and indicator choice.")], str(bank))
+    with pytest.raises(SystemExit) as exit_:
+        question_store.main(["check", str(bank)])
+    assert exit_.value.code == 1
+    assert "1 questions, 1 rubric warnings" in capsys.readouterr().out
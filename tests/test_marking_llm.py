@@ -0,0 +1,147 @@
+import threading
+import time
+
+import pytest
+
+import llm_cache
+import llm_client
+import marking
+from dispatcher import Dispatcher
+from fakes import Q, FakeClient, chunk, completion
+from llm_client import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+@pytest.fixture
+def llm(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(llm_client, "_dispatcher", Dispatcher(workers=2))
+    monkeypatch.setattr(llm_client, "_breaker", CircuitBreaker(5, 30.0))
+    monkeypatch.setattr(llm_cache, "_default_cache", llm_cache.FeedbackCache())
+
+    def install(reply, workers=2):
+        client = FakeClient(reply)
+        monkeypatch.setattr(llm_client, "_client", client)
+        monkeypatch.setattr(llm_client, "_dispatcher", Dispatcher(workers))
+        return client
+    return install
+
+def cooled_breaker():
+    # open, with its cooldown served: the next call is the half-open trial
+    breaker = llm_client.get_breaker()
+    for _ in range(breaker.failure_threshold):
+        breaker.failure()
+    breaker.opened_at -= breaker.cooldown
+    return breaker
+
+def in_threads(n, fn, *args):
+    results = [None] * n
+
+    def run(i):
+        results[i] = fn(*args)
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    return threads, results
+
+def wait_for(condition, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end
+        time.sleep(0.005)
+
+def test_queued_trial_dropped_at_deadline_frees_the_breaker(llm):
+    gate = threading.Event()
+    llm(lambda **_: gate.wait(5) and completion("late"), workers=1)
+    busy, _ = llm_client.get_dispatcher().submit("busy", gate.wait, 5)
+    wait_for(lambda: busy.started)
+    breaker = cooled_breaker()
+
+    fb = marking.llm_feedback("the forward reaction is exothermic", Q, deadline=0.05)
+    assert fb.startswith(marking.DEADLINE_NOTE)
+    assert breaker.state == OPEN
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    gate.set()
+
+def test_coalesced_callers_count_one_failure(llm):
+    gate = threading.Event()
+
+    def fail(**_):
+        gate.wait(5)
+        raise RuntimeError("upstream down")
+    client = llm(fail)
+    threads, results = in_threads(6, marking.llm_feedback, "the forward reaction is exothermic", Q)
+    wait_for(lambda: llm_client.get_dispatcher().snapshot()["coalesced"] == 5)
+    gate.set()
+    for t in threads:
+        t.join(5)
+    assert client.calls == 1
+    assert all(fb.startswith("⚠️ LLM error: upstream down") for fb in results)
+    assert llm_client.get_breaker().failures == 1
+
+def test_coalesced_deadline_misses_count_once(llm):
+    gate = threading.Event()
+    llm(lambda **_: gate.wait(5) and completion("slow"))
+    threads, results = in_threads(6, marking.llm_feedback, "the forward reaction is exothermic", Q, None, 0.2)
+    for t in threads:
+        t.join(5)
+    gate.set()
+    assert all(fb.startswith(marking.DEADLINE_NOTE) for fb in results)
+    assert llm_client.get_breaker().failures == 1
+
+def test_coalesced_streams_get_deltas_within_the_deadline(llm):
+    gate = threading.Event()
+
+    def stream(**_):
+        yield chunk("first ")
+        gate.wait(5)
+        yield chunk("second")
+    client = llm(stream)
+
+    def read():
+        timings = {}
+        return "".join(marking.llm_feedback_stream("the forward reaction is exothermic", Q, timings, deadline=0.2)), timings
+    first, _ = in_threads(1, read)
+    wait_for(lambda: client.calls == 1)
+    rest, results = in_threads(5, read)
+    time.sleep(0.3)  # past every caller's deadline, but the stream is already producing
+    gate.set()
+    for t in first + rest:
+        t.join(5)
+    assert client.calls == 1
+    assert [text for text, _ in results] == ["first second"] * 5
+    assert all(timings["coalesced"] and timings["source"] == "llm" for _, timings in results)
+    assert llm_client.get_breaker().failures == 0
+
+def test_stream_closed_early_still_reports_its_trial(llm):
+    gate = threading.Event()
+
+    def stream(**_):
+        yield chunk("first ")
+        gate.wait(5)
+        yield chunk("second")
+    llm(stream)
+    breaker = cooled_breaker()
+    feedback = marking.llm_feedback_stream("the forward reaction is exothermic", Q, {})
+    assert next(feedback) == "first "
+    assert breaker.state == HALF_OPEN
+    feedback.close()  # Streamlit stopped the script mid-write_stream
+    gate.set()
+    wait_for(lambda: llm_client.get_dispatcher().snapshot()["completed"] == 1)
+    assert breaker.state == CLOSED
+
+def test_queue_notice_only_when_jobs_are_ahead(llm):
+    llm(lambda **_: completion("ok"), workers=1)
+    seen = []
+    marking.llm_feedback("the forward reaction is exothermic", Q, on_queue=seen.append)
+    assert seen == []  # an idle dispatcher: straight to a worker, no notice
+
+    gate = threading.Event()
+    dispatcher = llm_client.get_dispatcher()
+    busy, _ = dispatcher.submit("busy", gate.wait, 5, session="other")
+    wait_for(lambda: busy.started)
+    dispatcher.submit("queued", lambda: None, session="other")
+    threads, results = in_threads(1, marking.llm_feedback, "the reverse reaction is endothermic", Q, None, None, "me", seen.append)
+    wait_for(lambda: seen)
+    assert seen == [1]
+    gate.set()
+    threads[0].join(5)
+    assert results[0] == "ok" and seen == [1, 0]
@@ -0,0 +1,83 @@
+import pytest
+
+import numeric
+from numeric import AMOUNT, CONCENTRATION, DIMENSIONLESS, MASS, NO_UNIT, VOLUME
+
+def compiled(calc, **params):
+    return numeric.compile_numeric({"calc": calc, "params": params})
+
+TITRATION = compiled("titration_concentration", acid_volume_ml=25.0, base_volume_ml=30.0, base_conc=0.100)
+WEAK_ACID = compiled("weak_acid_ph", conc=0.10, ka=1.8e-5)
+COMBUSTION = compiled("empirical_formula", mass_co2=2.64, mass_h2o=1.08)
+
+@pytest.mark.parametrize("text, expected", [
+    ("0.120 M", [(0.120, CONCENTRATION)]),
+    ("120 mM", [(0.120, CONCENTRATION)]),
+    ("0.12 mol/L", [(0.12, CONCENTRATION)]),
+    ("0.12 mol L-1", [(0.12, CONCENTRATION)]),
+    ("3.0 mmol", [(0.003, AMOUNT)]),
+    ("25.0 mL", [(0.025, VOLUME)]),
+    ("2.64 g", [(2.64, MASS)]),
+    ("1.8e-5", [(1.8e-5, NO_UNIT)]),
+    ("1.8×10⁻⁵", [(1.8e-5, NO_UNIT)]),
+    ("1.8 x 10^-5 M", [(1.8e-5, CONCENTRATION)]),
+    ("pH = 2.87", [(2.87, NO_UNIT)]),
+    ("n = 0.00300 mol and V = 0.0250 L", [(0.003, AMOUNT), (0.025, VOLUME)]),
+    ("H2O and CO2", []),  # digits inside formulas aren't quantities
+])
+def test_extract_quantities(text, expected):
+    got = numeric.extract_quantities(text)
+    assert [d for _, d in got] == [d for _, d in expected]
+    assert [v for v, _ in got] == pytest.approx([v for v, _ in expected])
+
+def test_calculators():
+    assert TITRATION["values"] == pytest.approx([0.120])
+    assert WEAK_ACID["values"][1] == pytest.approx(2.87, abs=0.01)
+    assert COMBUSTION["formula"] == "CH2"
+    assert COMBUSTION["values"] == pytest.approx([0.0600, 0.120], rel=0.01)
+    assert list(COMBUSTION["dims"]) == [AMOUNT, AMOUNT]
+    assert list(WEAK_ACID["dims"]) == [CONCENTRATION, DIMENSIONLESS]
+
+def test_check_batch_matches_any_candidate_with_the_right_unit():
+    hits = numeric.check_batch([
+        "n = 0.003 mol, so [HCl] = 0.120 M",
+        "[HCl] = 0.12",             # no unit: any dimension is accepted
+        "[HCl] = 120 mM",
+        "[HCl] = 0.120 g",          # right number, wrong dimension
+        "[HCl] = 0.100 M",
+        "",
+    ], TITRATION)
+    assert hits.shape == (6, 1)
+    assert list(hits[:, 0]) == [True, True, True, False, False, False]
+
+def test_check_batch_per_target():
+    hits = numeric.check_batch(["x = 1.34e-3 M so pH = 2.87", "pH = 2.9", "pH 3.5"], WEAK_ACID)
+    assert hits.tolist() == [[True, True], [False, False], [False, False]]
+
+def test_check_values():
+    assert numeric.check_values([0.120, 0.1205, 0.125], TITRATION).tolist() == [True, True, False]
+
+@pytest.mark.parametrize("answer, expected", [
+    ("The empirical formula is CH2.", True),
+    ("empirical formula: CH₂", True),
+    ("(CH2)", True),
+    ("CH", False),
+    ("CH2O", False),
+    ("CH2Cl2", False),
+    ("CH23", False),
+    ("C2H4", False),
+    ("OCH2", False),
+])
+def test_check_formula(answer, expected):
+    assert numeric.check_formula([answer], COMBUSTION).tolist() == [expected]
+
+def test_check_formula_without_a_formula():
+    assert numeric.check_formula(["CH2", "x"], TITRATION).tolist() == [False, False]
+
+def test_calc_note():
+    note = numeric.calc_note("n(C) = 0.0600 mol, n(H) = 0.120 mol, so CH2", COMBUSTION)
+    assert "Your moles of C is close" in note and "Your empirical formula (CH2) is correct." in note
+    note = numeric.calc_note("CH2O", COMBUSTION)
+    assert "The data give an empirical formula of CH2; check your mole ratio." in note
+    # an optional target is only mentioned when hit
+    assert "[H+]" not in numeric.calc_note("pH = 2.87", WEAK_ACID)
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+import marking
+import question_store
+from question_store import QuestionStore, load_questions, save_questions
+
+def plain(q: dict, **changes):
+    # a bank entry as an external file would hold it: no compiled rubric, no id unless given
+    return dict({k: v for k, v in q.items() if k not in ("rubric", "id")}, **changes)
+
+@pytest.fixture
+def fresh_store(monkeypatch):
+    monkeypatch.setattr(question_store, "_store", None)
+    monkeypatch.setattr(question_store, "_store_sig", None)
+    monkeypatch.setattr(question_store, "RELOAD_CHECK_SECONDS", 0.0)
+
+def test_indexes_match_the_bank():
+    store = QuestionStore(marking.QUESTION_BANK)
+    assert store.modules == sorted({q["module"] for q in marking.QUESTION_BANK})
+    assert store.groups == marking.GROUPS
+    for q in marking.QUESTION_BANK:
+        assert store.get(q["id"])["prompt"] == q["prompt"]
+        assert q["topic"] in store.topics(q["module"], q["group"])
+        assert q["prompt"] in [c["prompt"] for c in store.candidates(q["module"], q["group"], q["topic"])]
+    assert store.topics("no such module", marking.GROUPS[0]) == []
+    assert store.random_question("no such module", marking.GROUPS[0], "x") is None
+
+def test_derived_ids_do_not_depend_on_order():
+    base = plain(marking.QUESTION_BANK[0])
+    items = [base, dict(base, prompt=base["prompt"] + " Include an equation."),
+             dict(base, prompt="A third wording of the same topic.")]
+    forward = {q["prompt"]: q["id"] for q in QuestionStore(items).questions}
+    backward = {q["prompt"]: q["id"] for q in QuestionStore(items[::-1]).questions}
+    assert forward == backward
+    assert len(set(forward.values())) == 3
+    assert all(qid.startswith(marking.question_id(base) + "-") for qid in forward.values())
+    # inserting another item leaves the existing ids alone
+    grown = QuestionStore([plain(marking.QUESTION_BANK[1])] + items)
+    assert {p: grown.by_id[i]["prompt"] for p, i in forward.items()} == {p: p for p in forward}
+
+def test_explicit_ids_win_and_duplicates_are_numbered():
+    base = plain(marking.QUESTION_BANK[0])
+    store = QuestionStore([dict(base, id="haber"), dict(base, id="haber"), base, base])
+    ids = [q["id"] for q in store.questions]
+    assert ids[:2] == ["haber", "haber-2"]
+    assert ids[3] == ids[2] + "-2"
+
+@pytest.mark.parametrize("name", ["bank.json", "bank.sqlite"])
+def test_save_and_load_round_trip(tmp_path, name):
+    path = str(tmp_path / name)
+    save_questions(QuestionStore(marking.QUESTION_BANK).questions, path)
+    loaded = load_questions(path)
+    assert [q["id"] for q in loaded] == [q["id"] for q in marking.QUESTION_BANK]
+    assert all("rubric" not in q for q in loaded)
+
+def test_bank_file_is_hot_reloaded(tmp_path, fresh_store):
+    path = tmp_path / "bank.json"
+    bank = [plain(q) for q in marking.QUESTION_BANK[:3]]
+    path.write_text(json.dumps(bank), encoding="utf-8")
+    store = question_store.get_store(str(path))
+    assert question_store.get_store(str(path)) is store
+    qids = [q["id"] for q in store.questions]
+
+    bank.insert(0, plain(marking.QUESTION_BANK[5]))
+    bank[2] = dict(bank[2], topic=bank[2]["topic"] + " (revised)")
+    path.write_text(json.dumps(bank), encoding="utf-8")
+    reloaded = question_store.get_store(str(path))
+    assert reloaded is not store and len(reloaded.questions) == 4
+    assert reloaded.get(qids[0])["prompt"] == bank[1]["prompt"]  # untouched items keep their ids
+    assert reloaded.get(qids[2])["prompt"] == bank[3]["prompt"]
+    assert reloaded.get(qids[1]) is None  # its topic (part of the id) changed
+
+def test_half_written_bank_keeps_the_previous_version(tmp_path, fresh_store):
+    path = tmp_path / "bank.json"
+    path.write_text(json.dumps([plain(q) for q in marking.QUESTION_BANK[:3]]), encoding="utf-8")
+    store = question_store.get_store(str(path))
+    path.write_text('[{"module": "Module 5', encoding="utf-8")
+    assert question_store.get_store(str(path)) is store
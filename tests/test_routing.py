@@ -0,0 +1,99 @@
+import pytest
+
+import llm_cache
+import llm_client
+import marking
+import routing
+from dispatcher import Dispatcher
+from fakes import FakeClient, completion
+from question_store import get_store
+
+HABER = get_store().get("m5-haber-equilibrium-temperature")
+PH = get_store().get("m6-ph-basics")
+MODEL_ANSWER = ("The Haber process is N2 + 3H2 ⇌ 2NH3, and the forward reaction is exothermic. According to Le Chatelier's "
+                "principle, when temperature is increased the system shifts to favour the endothermic reverse reaction. "
+                "The equilibrium position shifts left, absorbing the added heat. As a result, the equilibrium yield of "
+                "ammonia decreases. In conclusion, increasing temperature lowers the yield of ammonia.")
+PH_ANSWER = "pH is defined as the negative log of the hydrogen ion concentration. A low pH indicates high [H+], so the solution is acidic."
+
+@pytest.fixture
+def routed(monkeypatch):
+    # routing with an LLM available (a fake client), no audits and fresh stats
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.delenv("CHEM_BOT_ROUTE_THRESHOLD", raising=False)
+    monkeypatch.setattr(routing, "AUDIT_RATE", 0.0)
+    monkeypatch.setattr(routing, "ROUTING", True)
+    monkeypatch.setattr(routing, "_stats", dict(routing._stats, local=0, escalated=0, audited=0, latency_saved_seconds=0.0,
+                                                agreement_sum=0.0, agreement_n=0))
+    monkeypatch.setattr(routing, "_llm_seconds", None)
+    monkeypatch.setattr(llm_client, "_client", FakeClient(lambda **_: completion("### ✅ Strengths\n• ok\n### ⚠️ Marks Lost\n• none")))
+    monkeypatch.setattr(llm_client, "_dispatcher", Dispatcher(2))
+    monkeypatch.setattr(llm_client, "_breaker", llm_client.CircuitBreaker())
+    monkeypatch.setattr(llm_cache, "_default_cache", llm_cache.FeedbackCache())
+    return llm_client._client
+
+def test_max_marks_and_thresholds(monkeypatch):
+    monkeypatch.delenv("CHEM_BOT_ROUTE_THRESHOLD", raising=False)
+    assert routing.max_marks(HABER) == 6
+    assert routing.max_marks(PH) == 2  # "(1–2 marks)" counts the top of the range
+    assert routing.max_marks({"prompt": "no marks given"}) == 0
+    assert routing.threshold_for(HABER) == 0.9
+    assert routing.threshold_for(PH) == 0.5
+    assert routing.threshold_for(dict(PH, route_threshold=0.8)) == 0.8
+    monkeypatch.setitem(routing.GROUP_THRESHOLDS, PH["group"], 0.7)
+    assert routing.threshold_for(PH) == 0.7
+    monkeypatch.setenv("CHEM_BOT_ROUTE_THRESHOLD", "2")
+    assert routing.threshold_for(PH) == 2.0
+
+def test_zero_overlap_criteria_are_undecided():
+    confidence, conf, covered = routing.local_assessment(MODEL_ANSWER, HABER)
+    assert (conf == 0).sum() == 2  # terminology and conclusion: no shared vocabulary
+    assert confidence < routing.threshold_for(HABER)
+    off_topic, _, _ = routing.local_assessment("Photosynthesis happens in chloroplasts.", HABER)
+    assert off_topic == 0.0
+
+def test_model_answer_to_a_six_mark_item_goes_to_the_llm(routed):
+    timings = {}
+    assert routing.routed_feedback(MODEL_ANSWER, HABER, timings).startswith("### ✅ Strengths\n• ok")
+    assert timings["tier"] == "llm" and timings["source"] == "llm"
+    assert routed.calls == 1
+
+def test_confident_short_answer_is_marked_locally(routed):
+    timings = {}
+    fb = routing.routed_feedback(PH_ANSWER, PH, timings)
+    assert timings["tier"] == "local" and timings["confidence"] >= timings["threshold"]
+    assert "% confidence)" in fb and routed.calls == 0
+    assert routing.stats()["latency_saved_seconds"] > 0
+
+def test_without_an_api_key_nothing_counts_as_saved(routed, monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY")
+    timings = {}
+    routing.routed_feedback(MODEL_ANSWER, HABER, timings)
+    assert timings["tier"] == "local"
+    assert routing.stats()["local"] == 1 and routing.stats()["latency_saved_seconds"] == 0.0
+
+def test_routing_off_sends_everything_to_the_llm(routed, monkeypatch):
+    monkeypatch.setattr(routing, "ROUTING", False)
+    timings = {}
+    routing.routed_feedback(PH_ANSWER, PH, timings)
+    assert timings["tier"] == "llm" and routed.calls == 1
+
+def test_audits_sample_confident_answers(routed, monkeypatch):
+    monkeypatch.setattr(routing, "AUDIT_RATE", 1.0)
+    timings = {}
+    routing.routed_feedback(PH_ANSWER, PH, timings)
+    assert timings["tier"] == "audit" and routing.stats()["audited"] == 1
+
+def test_cache_hits_are_not_timed_as_llm_calls(routed):
+    routing.routed_feedback(MODEL_ANSWER, HABER, {})
+    llm_seconds = routing._llm_seconds
+    timings = {}
+    routing.routed_feedback(MODEL_ANSWER, HABER, timings)
+    assert timings["source"] == "cache" and routed.calls == 1
+    assert routing._llm_seconds == llm_seconds
+    assert routing.stats()["escalated"] == 2 and routing.stats()["agreement_n"] == 1
+
+def test_stream_routes_the_same_way(routed):
+    timings = {}
+    text = "".join(routing.routed_feedback_stream(PH_ANSWER, PH, timings))
+    assert timings["tier"] == "local" and timings["source"] == "local" and "% confidence)" in text
@@ -0,0 +1,97 @@
+import random
+
+import numpy as np
+import pytest
+
+import batch_mark
+import marking
+import similarity
+from question_store import QuestionStore
+from similarity import LiveCoverage, SimilarityIndex
+
+STORE = QuestionStore(marking.QUESTION_BANK)
+INDEX = STORE.similarity
+HABER = STORE.get("m5-haber-equilibrium-temperature")
+
+def test_tokenize_stems_and_drops_stopwords():
+    assert similarity.tokenize("The reactions are shifting; it favours equilibrium.") == ["reaction", "shift", "favour", "equilibrium"]
+    assert similarity.stem("oxidation") == "oxidate"
+    assert similarity.stem("gas") == "gas"  # too short to strip
+
+def test_confidence_tracks_criterion_coverage():
+    answer = ("The forward reaction forming ammonia is exothermic. Increasing temperature shifts equilibrium "
+              "towards the endothermic direction, so the added heat is absorbed and the ammonia yield decreases.")
+    confidence, exemplar_sim = INDEX.score(answer, HABER)
+    assert confidence.shape == (len(HABER["criteria"]),)
+    assert confidence[0] >= similarity.COVERED_CONFIDENCE  # exothermic forward reaction
+    assert confidence[3] >= similarity.COVERED_CONFIDENCE  # yield decreases
+    assert 0.0 < exemplar_sim <= 1.0
+    off_topic, off_sim = INDEX.score("Photosynthesis happens in chloroplasts.", HABER)
+    assert not off_topic.any() and off_sim == 0.0
+
+def test_confidence_is_bounded_and_ignores_length():
+    answer = "The forward reaction is exothermic."
+    short, _ = INDEX.score(answer, HABER)
+    padded, _ = INDEX.score(answer + " Unrelated filler about something else." * 50, HABER)
+    assert np.all((short >= 0) & (short <= 1))
+    np.testing.assert_allclose(short, padded)
+
+def test_batch_matches_single_scores():
+    answers = ["", "exothermic", HABER["criteria"][1], marking.rubric_for(HABER)["exemplar"]]
+    confidence, exemplar_sim = INDEX.score_batch(answers, HABER)
+    for i, answer in enumerate(answers):
+        single, sim = INDEX.score(answer, HABER)
+        np.testing.assert_allclose(confidence[i], single)
+        assert exemplar_sim[i] == pytest.approx(sim)
+    assert not confidence[0].any()
+
+def test_question_added_after_load_is_vectorised_on_demand():
+    index = SimilarityIndex(STORE.questions[1:])
+    q = STORE.questions[0]
+    confidence, _ = index.score(q["criteria"][0], q)
+    assert confidence[0] == pytest.approx(1.0)
+
+def test_split_and_local_feedback():
+    confidence = np.array([1.0, 0.5, 0.49, 0.0, 0.0, 0.0])
+    strengths, misses = similarity.split(HABER, confidence)
+    assert strengths == [f"{HABER['criteria'][0]} (100% confidence)", f"{HABER['criteria'][1]} (50% confidence)"]
+    assert len(misses) == 4
+    fb = similarity.local_feedback("The forward reaction is exothermic.", HABER, INDEX)
+    assert "### ✅ Strengths" in fb and "Identifies forward ammonia formation as exothermic." in fb.split("Marks Lost")[0]
+
+def test_batch_mark_tfidf_scorer():
+    rows = [(0, {"question_id": HABER["id"], "student_id": "s1", "answer": "The forward reaction is exothermic."})]
+    _, _, [rec] = batch_mark.mark_chunk(rows, scorer="tfidf")
+    assert len(rec["confidence"]) == len(HABER["criteria"]) and rec["confidence"][0] >= similarity.COVERED_CONFIDENCE
+    assert "% confidence)" in rec["feedback"]
+
+def test_live_coverage_matches_full_rescoring():
+    # random edit sequences: every intermediate answer scores exactly as a full re-score would
+    rng = random.Random(16)
+    words = [w for c in HABER["criteria"] for w in c.split()] + ["the", "so", "because", "yield", "shifts"]
+    for q in STORE.questions[:6]:
+        for _ in range(5):
+            live = LiveCoverage(q, INDEX)
+            sentences = []
+            for _ in range(26):
+                op = rng.random()
+                if op < 0.4 or not sentences:
+                    sentences.insert(rng.randint(0, len(sentences)), " ".join(rng.choices(words, k=rng.randint(1, 8))) + ".")
+                elif op < 0.6:
+                    sentences.pop(rng.randrange(len(sentences)))
+                else:
+                    i = rng.randrange(len(sentences))
+                    sentences[i] = sentences[i][:-1] + " " + rng.choice(words) + "."
+                text = rng.choice((" ", "\n")).join(sentences)
+                np.testing.assert_allclose(live.update(text), INDEX.score(text, q)[0], atol=1e-6)
+
+def test_live_coverage_retokenises_only_changed_sentences():
+    live = LiveCoverage(HABER, INDEX)
+    live.update("The forward reaction is exothermic. Heat shifts it left.")
+    assert live.retokenised == 2
+    live.update("The forward reaction is exothermic. Heat shifts it left. Yield falls.")
+    assert live.retokenised == 1
+    live.update("The forward reaction is exothermic. Heat shifts it right. Yield falls.")
+    assert live.retokenised == 1
+    live.update("The forward reaction is exothermic. Heat shifts it right. Yield falls.")
+    assert live.retokenised == 0
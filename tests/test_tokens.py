@@ -0,0 +1,64 @@
+import asyncio
+import types
+
+import pytest
+
+import llm_cache
+import llm_client
+import marking
+import tokens
+from async_grader import AsyncGrader
+from fakes import Q, FakeClient, completion
+
+@pytest.fixture
+def approx(monkeypatch):
+    # the word-piece approximation, whether or not tiktoken is installed here
+    monkeypatch.setattr(tokens, "_encoding", lambda: None)
+
+def test_approximation_splits_words_numbers_and_symbols(approx):
+    assert tokens.count_tokens("") == 0
+    assert tokens.count_tokens("the acid") == 2
+    assert tokens.count_tokens("concentration") == 3   # 6 + 6 + 1 letters
+    assert tokens.count_tokens("25000") == 2           # 3 + 2 digits
+    assert tokens.count_tokens("N2 + 3H2 ⇌ 2NH3") == 10
+
+def test_messages_carry_framing_overhead(approx):
+    messages = [{"role": "system", "content": "be brief"}, {"role": "user", "content": "the acid"}]
+    assert tokens.count_message_tokens(messages) == 2 + 2 + 2 * tokens.MESSAGE_OVERHEAD + tokens.REPLY_OVERHEAD
+
+def test_over_limit(approx):
+    assert not tokens.over_limit("word " * tokens.MAX_ANSWER_TOKENS)
+    assert tokens.over_limit("word " * (tokens.MAX_ANSWER_TOKENS + 1))
+    assert tokens.over_limit("one two three", limit=2)
+
+def test_report_prefers_provider_usage(approx):
+    messages = [{"role": "user", "content": "the acid"}]
+    local = tokens.token_report(messages, "well done")
+    assert local == {"input_tokens": 2 + tokens.MESSAGE_OVERHEAD + tokens.REPLY_OVERHEAD, "output_tokens": 2}
+    usage = types.SimpleNamespace(prompt_tokens=40, completion_tokens=7,
+                                  prompt_tokens_details=types.SimpleNamespace(cached_tokens=32))
+    assert tokens.token_report(messages, "well done", usage) == {"input_tokens": 40, "output_tokens": 7, "cached_tokens": 32}
+    partial = types.SimpleNamespace(prompt_tokens=40, completion_tokens=None)
+    assert tokens.token_report(messages, "well done", partial) == {"input_tokens": 40, "output_tokens": 2}
+
+@pytest.fixture
+def long_answer(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(llm_cache, "_default_cache", llm_cache.FeedbackCache())
+    return "the equilibrium shifts left " * tokens.MAX_ANSWER_TOKENS
+
+def test_over_long_answers_are_not_sent(monkeypatch, long_answer):
+    client = FakeClient(lambda **_: completion("unused"))
+    monkeypatch.setattr(llm_client, "_client", client)
+    timings = {}
+    assert marking.llm_feedback(long_answer, Q, timings).startswith(marking.TOO_LONG_NOTE)
+    streamed = "".join(marking.llm_feedback_stream(long_answer, Q, timings))
+    assert streamed.startswith(marking.TOO_LONG_NOTE) and timings["fallback"] == "too_long"
+    assert client.calls == 0
+
+def test_async_grader_rejects_over_long_answers(long_answer):
+    client = FakeClient(lambda **_: completion("unused"))
+    result = asyncio.run(AsyncGrader(client=client).grade(long_answer, Q))
+    assert result["source"] == "heuristic" and result["error"] == "answer too long"
+    assert result["feedback"].startswith(marking.TOO_LONG_NOTE)
+    assert client.calls == 0
@@ -0,0 +1,55 @@
+import functools
+import os
+import re
+
+# ----------------------------
+# Local token counting
+#  - Exact with tiktoken (o200k_base, the gpt-4o family encoding) when it is installed and its
+#    encoding file is available; otherwise a word-piece approximation (common words are one
+#    token, long ones split every 6 letters, each symbol counted on its own)
+#  - Used to report per-call input/output tokens and to cap answer length before sending
+# ----------------------------
+MAX_ANSWER_TOKENS = int(os.getenv("CHEM_BOT_MAX_ANSWER_TOKENS", "1200"))
+
+# per-message framing tokens in the chat format, plus the reply primer
+MESSAGE_OVERHEAD = 3
+REPLY_OVERHEAD = 3
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+@functools.lru_cache(maxsize=1)
+def _encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:  # the encoding is downloaded on first use; offline hosts approximate
+        return None
+
+_PIECE = re.compile(r"[A-Za-z]{1,6}|\d{1,3}|[^\sA-Za-z\d]")
+
+def count_tokens(text: str):
+    enc = _encoding()
+    if enc is not None:
+        return len(enc.encode(text))
+    return len(_PIECE.findall(text))
+
+def count_message_tokens(messages):
+    return sum(MESSAGE_OVERHEAD + count_tokens(m["content"]) for m in messages) + REPLY_OVERHEAD
+
+def over_limit(answer: str, limit: int = None):
+    return count_tokens(answer) > (MAX_ANSWER_TOKENS if limit is None else limit)
+
+def token_report(messages, output: str, usage=None):
+    # per-call counts: the provider's when it reports usage, local counts otherwise
+    report = {"input_tokens": count_message_tokens(messages), "output_tokens": count_tokens(output)}
+    if usage is not None:
+        report["input_tokens"] = getattr(usage, "prompt_tokens", None) or report["input_tokens"]
+        report["output_tokens"] = getattr(usage, "completion_tokens", None) or report["output_tokens"]
+        cached = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+        if cached is not None:
+            report["cached_tokens"] = cached
+    return report